@@ -0,0 +1,110 @@
+# allocation.py
+import numpy as np
+import pandas as pd
+
+class Allocation:
+    """Result of splitting order lines between stock and supplier orders.
+
+    stock_ship      Order number, Offer SKU, Supplier Name, Quantity shipped from stock
+    supplier_orders Order number, Offer SKU, Supplier Name, Quantity to order from the supplier
+    remaining_stock Supplier Name, Offer SKU, Quantity left for every SKU that shipped from stock
+    """
+
+    def __init__(self, stock_ship: pd.DataFrame, supplier_orders: pd.DataFrame, remaining_stock: pd.DataFrame):
+        self.stock_ship = stock_ship
+        self.supplier_orders = supplier_orders
+        self.remaining_stock = remaining_stock
+
+    def stock_lines(self):
+        return lines_by_order(self.stock_ship)
+
+    def remaining_by_name(self) -> dict:
+        """{supplier: {sku: qty left}} for every supplier that shipped from stock."""
+        return {
+            supplier: dict(zip(rows['Offer SKU'].tolist(), rows['Quantity'].tolist()))
+            for supplier, rows in self.remaining_stock.groupby('Supplier Name', sort=False)
+        }
+
+
+def lines_by_order(table: pd.DataFrame) -> dict:
+    """{order number: [(sku, qty), ...]} in table order, with plain Python values."""
+    out = {}
+    for order_no, sku, qty in zip(table['Order number'].tolist(), table['Offer SKU'].tolist(), table['Quantity'].tolist()):
+        out.setdefault(order_no, []).append((sku, qty))
+    return out
+
+
+def _as_int_if_whole(values: np.ndarray) -> np.ndarray:
+    """values as int64 when every one is a whole number, otherwise unchanged."""
+    finite = values[~np.isnan(values)]
+    if len(finite) == len(values) and np.all(finite == np.floor(finite)):
+        return values.astype(np.int64)
+    return values
+
+
+def allocate_orders(orders: pd.DataFrame, routing) -> Allocation:
+    """Consume stock per SKU in file order and send the shortfall to the SKU's supplier.
+
+    orders needs Order number, Offer SKU and Quantity. routing is a compiled
+    suppliers.RoutingTable; lines it does not route to a registered supplier are skipped.
+    Matches the row-by-row rules: a SKU missing from the stock sheet has 0 stock, a blank
+    (NaN) stock cell covers every line, and negative stock is never shipped from. The work
+    per line is the same however many suppliers are registered.
+
+    Each output table's Quantity is int when all its values are whole numbers, float
+    otherwise. This differs from the row-by-row loop for float-typed stock sheets (one
+    blank stock cell is enough): the loop wrote "3.0" wherever the stock cell was the
+    smaller side of min(), where the order text, PO CSVs and PO map now show "3".
+    """
+    pos, codes, opening = routing.route(orders['Offer SKU'])
+    routed = codes >= 0
+    lines = orders[routed]
+    pos, codes, opening = pos[routed], codes[routed], opening[routed]
+    supplier = np.asarray(routing.names, dtype=object)[codes]
+    sku = lines['Offer SKU']
+    qty = lines['Quantity'].astype(int).to_numpy().astype(np.float64)
+
+    # Stock consumed by earlier lines of the same SKU (so the same supplier), in file order.
+    consumed = pd.Series(np.clip(qty, 0, None)).groupby(pos, sort=False).cumsum().to_numpy()
+    consumed_before = consumed - np.clip(qty, 0, None)
+
+    blank = np.isnan(opening)
+    negative = opening < 0
+    available = np.clip(opening - consumed_before, 0, None)
+    from_stock = np.where(blank, qty, np.where(negative, opening, np.minimum(qty, available)))
+    to_supplier = qty - from_stock
+    closing = np.where(blank, np.nan, np.clip(opening - consumed, 0, None))
+
+    base = pd.DataFrame({
+        'Order number': lines['Order number'].to_numpy(),
+        'Offer SKU': sku.to_numpy(),
+        'Supplier Name': supplier,
+    })
+    shipped = from_stock > 0
+    stock_ship = base[shipped].assign(Quantity=_as_int_if_whole(from_stock[shipped])).reset_index(drop=True)
+    ordered = to_supplier > 0
+    supplier_orders = base[ordered].assign(Quantity=_as_int_if_whole(to_supplier[ordered])).reset_index(drop=True)
+    remaining = (
+        base[shipped][['Supplier Name', 'Offer SKU']]
+        .assign(Quantity=closing[shipped])
+        .drop_duplicates(['Supplier Name', 'Offer SKU'], keep='last')
+        .reset_index(drop=True)
+    )
+    remaining['Quantity'] = _as_int_if_whole(remaining['Quantity'].to_numpy())
+    return Allocation(stock_ship, supplier_orders, remaining)
+
+
+def apply_remaining_stock(stock_df: pd.DataFrame, remaining: dict) -> pd.DataFrame:
+    """Write remaining quantities back onto a stock sheet in one indexed update.
+
+    Only the first row for each SKU is updated, SKUs absent from the sheet are ignored,
+    and row order and all other columns are left untouched.
+    """
+    if not remaining:
+        return stock_df
+    skus = stock_df['Offer SKU']
+    target = skus.isin(remaining.keys()) & ~skus.duplicated(keep='first')
+    if target.any():
+        values = skus[target].map(remaining).to_numpy()
+        stock_df.loc[target, 'Quantity'] = np.where(values < 0, 0, values)
+    return stock_df
@@ -0,0 +1,166 @@
+# artifact_store.py
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "caterboss_artifacts"))
+ARTIFACT_MEMORY_MB = int(os.getenv("ARTIFACT_MEMORY_MB", "64"))
+ARTIFACT_TTL_HOURS = float(os.getenv("ARTIFACT_TTL_HOURS", "24"))
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class ArtifactStore:
+    """Generated files (Zoho XLSX, DPD CSV, Nisbets batch CSVs) keyed by run id.
+
+    Every artifact is written through to <ARTIFACT_DIR>/<run id>/<name>, so any uvicorn
+    worker can serve it and it survives a restart. A byte-budgeted LRU keeps recent
+    artifacts in memory, and runs older than the TTL are removed from both.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, memory_bytes: int = ARTIFACT_MEMORY_MB * 1024 * 1024,
+                 ttl_seconds: float = ARTIFACT_TTL_HOURS * 3600):
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _run_dir(self, run_id: str) -> str:
+        if not run_id or not _SAFE_NAME.match(run_id):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return os.path.join(self.root, run_id)
+
+    def _path(self, run_id: str, name: str) -> str:
+        if not _SAFE_NAME.match(name):
+            raise ValueError(f"Invalid artifact name: {name!r}")
+        return os.path.join(self._run_dir(run_id), name)
+
+    def _remember(self, key, data: bytes) -> None:
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old[0])
+            if len(data) > self.memory_bytes:
+                return
+            self._memory[key] = (data, time.time() + self.ttl_seconds)
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def put(self, run_id: str, name: str, data: bytes) -> None:
+        path = self._path(run_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._remember((run_id, name), data)
+
+    def get(self, run_id: str, name: str, cached: bool = True):
+        """Return the artifact bytes, or None when the run or artifact is unknown or expired.
+
+        cached=False reads the file on disk, for artifacts another worker may have rewritten.
+        """
+        key = (run_id, name)
+        now = time.time()
+        with self._lock:
+            if not cached:
+                self._memory_used -= len(self._memory.pop(key, (b"",))[0])
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                self._memory.pop(key)
+                self._memory_used -= len(entry[0])
+        try:
+            path = self._path(run_id, name)
+            if now - os.path.getmtime(path) > self.ttl_seconds:
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    def names(self, run_id: str) -> list:
+        try:
+            return sorted(n for n in os.listdir(self._run_dir(run_id)) if not n.endswith(".tmp") and n != "run.json")
+        except (OSError, ValueError):
+            return []
+
+    def start_run(self, run_id: str, **info) -> None:
+        """Record a new run as the latest one, so links without a run id still resolve."""
+        self.put(run_id, "run.json", json.dumps({"run_id": run_id, "started_at": time.time(), **info}).encode("utf-8"))
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(run_id)
+        os.replace(tmp_path, os.path.join(self.root, "LATEST"))
+        self.expire()
+
+    def latest_run(self):
+        try:
+            with open(os.path.join(self.root, "LATEST"), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def expire(self) -> int:
+        """Delete run directories older than the TTL; returns how many were removed."""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        with self._lock:
+            for key in [k for k, (_, expires_at) in self._memory.items() if expires_at < time.time()]:
+                self._memory_used -= len(self._memory.pop(key)[0])
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "memory_budget": self.memory_bytes,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
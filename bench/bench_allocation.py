@@ -0,0 +1,81 @@
+# bench_allocation.py
+"""Time stock allocation: the iterrows loop vs allocation.allocate_orders.
+
+Both sides get the same order lines and stock sheets, with repeated SKUs, zero and negative
+stock, SKUs missing from the stock sheets and SKUs no registered supplier takes. The script
+fails unless the stock shipments, supplier orders and remaining stock are identical.
+
+    python bench/bench_allocation.py --lines 100000 --skus 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from allocation import allocate_orders, lines_by_order  # noqa: E402
+from legacy import allocate_orders as legacy_allocate_orders  # noqa: E402
+from suppliers import Supplier, SupplierRegistry  # noqa: E402
+
+SUPPLIERS = ['Nortons', 'Nisbets']
+
+
+def make_inputs(lines, skus, seed=0):
+    rng = np.random.default_rng(seed)
+    catalogue = [f"SKU{n:06d}" for n in range(skus)]
+    sku_supplier = rng.choice(SUPPLIERS + ['Other'], skus, p=[0.45, 0.45, 0.1])
+    sku_to_supplier = dict(zip(catalogue, sku_supplier))
+    stock_maps = {supplier: {} for supplier in SUPPLIERS}
+    for sku, supplier, qty, listed in zip(catalogue, sku_supplier, rng.integers(-3, 40, skus), rng.random(skus)):
+        if supplier in stock_maps and listed < 0.9:
+            stock_maps[supplier][sku] = int(qty)
+    line_skus = rng.choice(catalogue, lines)
+    orders = pd.DataFrame({
+        'Order number': [f"X{n:09d}-A" for n in np.repeat(np.arange(lines), 2)[:lines]],
+        'Offer SKU': line_skus,
+        'Quantity': rng.integers(1, 6, lines),
+    })
+    orders['Supplier Name'] = orders['Offer SKU'].map(sku_to_supplier)
+    return orders, sku_to_supplier, stock_maps
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def vectorised(orders, sku_to_supplier, stock_maps):
+    registry = SupplierRegistry()
+    for name in SUPPLIERS:
+        registry.register(Supplier(name, stock_file_id=name))
+    return allocate_orders(orders, registry.compile(sku_to_supplier, stock_maps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    orders, sku_to_supplier, stock_maps = make_inputs(args.lines, args.skus, args.seed)
+    (stock_ship, supplier_orders, stock_left, shipped), old_secs = timed(legacy_allocate_orders, orders, stock_maps)
+    allocation, new_secs = timed(vectorised, orders, sku_to_supplier, stock_maps)
+
+    assert allocation.stock_lines() == stock_ship, "stock shipments differ"
+    for supplier in SUPPLIERS:
+        rows = allocation.supplier_orders[allocation.supplier_orders['Supplier Name'] == supplier]
+        assert lines_by_order(rows) == supplier_orders[supplier], f"{supplier} orders differ"
+    remaining = allocation.remaining_by_name()
+    for supplier in SUPPLIERS:
+        expected = {sku: stock_left[supplier][sku] for sku in shipped[supplier]}
+        assert remaining.get(supplier, {}) == expected, f"{supplier} remaining stock differs"
+    print(f"{args.lines} lines over {args.skus} SKUs: loop {old_secs:.2f}s, vectorised {new_secs:.2f}s, identical")
+
+
+if __name__ == "__main__":
+    main()
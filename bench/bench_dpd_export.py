@@ -0,0 +1,79 @@
+# bench_dpd_export.py
+"""Time building the DPD import CSV: the per-row field map vs dpd_export.build_dpd_export.
+
+Uses the width and delimiter of the DPD template in the repo root, and reports the
+tracemalloc peak of each builder.
+
+    python bench/bench_dpd_export.py --rows 10000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from dpd_export import build_dpd_export  # noqa: E402
+from legacy import build_dpd_export as legacy_build_dpd_export  # noqa: E402
+from template_registry import dpd_layout  # noqa: E402
+
+
+def make_inputs(rows, seed=0):
+    """Parcel rows with blanks in required and optional columns, quotes, delimiters and numeric columns with gaps."""
+    rng = np.random.default_rng(seed)
+
+    def text(prefix, blank_share=0.0):
+        values = np.array([f"{prefix} {n}" for n in range(rows)], dtype=object)
+        values[rng.random(rows) < 0.01] = f'{prefix} "quoted"; with, delimiters'
+        values[rng.random(rows) < blank_share] = np.nan
+        return values
+
+    phone = rng.integers(830000000, 899999999, rows).astype(np.float64)
+    phone[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        'Order number': [f"X{n:09d}-A" for n in range(rows)],
+        'Shipping address company': text("Company", 0.01),
+        'Shipping address street 1': text("Street"),
+        'Shipping address street 2': text("Unit", 0.5),
+        'Shipping address city': text("City"),
+        'Shipping address state': text("County", 0.3),
+        'Shipping address zip': text("D0", 0.01),
+        'Shipping address first name': text("Name"),
+        'Shipping address phone': phone,
+        'dpd_parcel_count': rng.integers(1, 5, rows),
+    })
+
+
+def measured(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    secs = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    layout = dpd_layout(os.path.join(ROOT, "DPD.Import(1).csv"))
+    rows = make_inputs(args.rows, args.seed)
+    call = (rows, layout["column_count"], layout["delimiter"])
+    old, old_secs, old_mb = measured(legacy_build_dpd_export, *call)
+    new, new_secs, new_mb = measured(build_dpd_export, *call)
+    print(f"{args.rows} parcel rows, {layout['column_count']} columns:")
+    print(f"  field map: {old_secs:.2f}s, peak {old_mb:.0f} MB")
+    print(f"  columnar:  {new_secs:.2f}s, peak {new_mb:.0f} MB")
+    print(f"  identical CSV: {old[0] == new[0]}, identical errors: {old[1] == new[1]}")
+
+
+if __name__ == "__main__":
+    main()
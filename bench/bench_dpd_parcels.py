@@ -0,0 +1,59 @@
+# bench_dpd_parcels.py
+"""Time the DPD parcel count per base order: the iterrows loop vs dpd_export.dpd_parcel_rows.
+
+    python bench/bench_dpd_parcels.py --orders 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dpd_export import dpd_parcel_rows  # noqa: E402
+from legacy import dpd_parcel_rows as legacy_dpd_parcel_rows  # noqa: E402
+
+
+def make_inputs(orders, seed=0):
+    """-A/-B order lines as the upload prepares them, with SKU case and padding varied, and SKU limits for some SKUs."""
+    rng = np.random.default_rng(seed)
+    lines_per_order = rng.integers(1, 4, orders)
+    base = np.repeat([f"X{n:09d}" for n in range(orders)], lines_per_order)
+    suffix = np.where(rng.random(len(base)) < 0.8, 'A', 'B')
+    sku_numbers = rng.integers(0, 2000, len(base))
+    skus = [f" sku{n} " if n % 7 == 0 else f"SKU{n}" for n in sku_numbers]
+    orders_df = pd.DataFrame({
+        'Order number': [f"{b}-{s}" for b, s in zip(base, suffix)],
+        'Offer SKU': skus,
+        'Quantity': rng.integers(1, 12, len(base)),
+        'Shipping address city': rng.choice(['Dublin', 'Cork', 'Galway'], len(base)),
+        'base_order': base,
+        'order_suffix': suffix,
+    })
+    sku_limits = {f"SKU{n}": int(limit) for n, limit in zip(range(0, 2000, 5), rng.integers(1, 6, 400))}
+    return orders_df, sku_limits
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    orders_df, sku_limits = make_inputs(args.orders, args.seed)
+    old, old_secs = timed(legacy_dpd_parcel_rows, orders_df, sku_limits)
+    new, new_secs = timed(dpd_parcel_rows, orders_df, sku_limits)
+    print(f"{args.orders} base orders ({len(orders_df)} lines): loop {old_secs:.2f}s, vectorised {new_secs:.2f}s, "
+          f"identical: {old.equals(new)}, same parcel counts: {old['dpd_parcel_count'].tolist() == new['dpd_parcel_count'].tolist()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# bench_excel_writer.py
+"""Time and measure writing a Zoho-shaped export: DataFrame.to_excel on each engine vs
+excel_writer.write_xlsx.
+
+Each writer runs in its own process, which resets its RSS high-water mark after building
+the frame and reports how far the write raised it (Linux only). The frame has the Zoho
+template's 108 columns: text with gaps, integer quantities, float amounts with gaps, order
+dates, a constant and columns left empty. No text starts with '=', the one case where
+write_xlsx deliberately differs. The script reads every workbook back with calamine and
+fails unless every cell value matches the to_excel workbooks'.
+
+    python bench/bench_excel_writer.py --rows 10000
+    python bench/bench_excel_writer.py --rows 200000 --writers xlsxwriter write_xlsx
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WRITERS = ["openpyxl", "xlsxwriter", "write_xlsx"]
+
+
+def make_frame(rows, seed=0):
+    import numpy as np
+    import pandas as pd
+    from template_registry import zoho_layout
+
+    rng = np.random.default_rng(seed)
+    columns = zoho_layout(os.path.join(ROOT, "column format.xlsx"))["columns"]
+    data = {}
+    for pos, name in enumerate(columns):
+        if name == 'Quantity':
+            data[name] = rng.integers(1, 20, rows)
+        elif name == 'Date created':
+            start = datetime.date(2024, 1, 1)
+            data[name] = [start + datetime.timedelta(days=int(n)) for n in rng.integers(0, 365, rows)]
+        elif pos % 9 == 1:
+            values = rng.integers(100, 100000, rows) / 100
+            values[rng.random(rows) < 0.05] = np.nan
+            data[name] = values
+        elif pos % 9 == 2:
+            data[name] = "GBP"
+        elif pos % 9 == 3:
+            data[name] = ""
+        else:
+            values = np.array([f"{name} {n % 997}" for n in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.05] = None
+            data[name] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def run_writer(writer, rows, seed, out_path):
+    """Child process body: build the frame, write it once, report seconds and peak RSS growth."""
+    from io import BytesIO
+    from excel_writer import write_xlsx
+
+    df = make_frame(rows, seed)
+    # Start the high-water mark from here, so only the write is measured.
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    rss_before = _status_mb("VmRSS")
+    started = time.perf_counter()
+    if writer == "write_xlsx":
+        data = write_xlsx(df)
+    else:
+        buffer = BytesIO()
+        df.to_excel(buffer, index=False, engine=writer)
+        data = buffer.getvalue()
+    seconds = time.perf_counter() - started
+    rss_mb = _status_mb("VmHWM") - rss_before
+    with open(out_path, "wb") as f:
+        f.write(data)
+    print(json.dumps({"seconds": seconds, "rss_mb": rss_mb}))
+
+
+def read_cells(path):
+    from python_calamine import CalamineWorkbook
+    return CalamineWorkbook.from_path(path).get_sheet_by_index(0).to_python()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--writers", nargs="+", choices=WRITERS, default=WRITERS)
+    parser.add_argument("--child", nargs=4, metavar=("WRITER", "ROWS", "SEED", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        writer, rows, seed, out_path = args.child
+        run_writer(writer, int(rows), int(seed), out_path)
+        return
+    if "write_xlsx" not in args.writers or len(args.writers) < 2:
+        parser.error("--writers needs write_xlsx and at least one to_excel engine to compare against")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        print(f"{args.rows} rows:")
+        paths = {}
+        for writer in args.writers:
+            path = os.path.join(scratch, f"{writer}.xlsx")
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", writer, str(args.rows), str(args.seed), path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            paths[writer] = path
+            label = writer if writer == "write_xlsx" else f"to_excel {writer}"
+            print(f"  {label:<20} {result['seconds']:8.2f}s  +{result['rss_mb']:.0f}MB peak RSS")
+        reference = read_cells(paths["write_xlsx"])
+        for writer, path in paths.items():
+            assert read_cells(path) == reference, f"to_excel {writer} cell values differ from write_xlsx"
+        print(f"  identical cell values: {', '.join(paths)} ({len(reference) - 1} rows x {len(reference[0])} columns)")
+
+
+if __name__ == "__main__":
+    main()
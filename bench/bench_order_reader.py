@@ -0,0 +1,137 @@
+# bench_order_reader.py
+"""Time and measure reading the uploaded orders workbook: pd.read_excel plus the old stage
+copies vs order_reader.read_orders on each installed engine.
+
+Each reader runs in its own process, which resets its RSS high-water mark after its
+imports and reports how far the read raised it (Linux only). The generated export has the
+Zoho template's columns, the DPD source columns and 10 columns the pipeline never reads; some rows are blank in every column the pipeline reads, including the last ones.
+The script fails unless every reader returns exactly the wanted columns of pd.read_excel.
+
+    python bench/bench_order_reader.py --rows 10000
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Order file columns the DPD export reads, as in main.DPD_SOURCE_COLUMNS.
+DPD_SOURCE_COLUMNS = [
+    'Order number', 'Offer SKU', 'Quantity', 'Shipping address company',
+    'Shipping address street 1', 'Shipping address street 2', 'Shipping address city',
+    'Shipping address state', 'Shipping address zip', 'Shipping address first name',
+    'Shipping address phone',
+]
+EXTRA_COLUMNS = [f"Unused column {n}" for n in range(10)]
+READERS = ["read_excel", "openpyxl", "calamine"]
+
+
+def wanted_columns():
+    from order_reader import ORDER_LINE_COLUMNS
+    from template_registry import zoho_layout
+    zoho_columns = zoho_layout(os.path.join(ROOT, "column format.xlsx"))["columns"]
+    return list(dict.fromkeys(ORDER_LINE_COLUMNS + DPD_SOURCE_COLUMNS + zoho_columns))
+
+
+def make_workbook(rows, path, seed=0):
+    import numpy as np
+    import pandas as pd
+    from excel_writer import write_xlsx
+
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in wanted_columns() + EXTRA_COLUMNS:
+        if name == 'Order number':
+            columns[name] = [f"X{n:09d}-{'AB'[n % 2]}" for n in range(rows)]
+        elif name in ('Quantity', 'Amount'):
+            columns[name] = rng.integers(1, 20, rows)
+        else:
+            values = np.array([f"{name} {n % 997}" for n in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.05] = None
+            columns[name] = values
+    df = pd.DataFrame(columns)
+    # Rows with data only in columns the pipeline never reads, every 50th row and the last three.
+    blank_rows = np.r_[np.arange(49, rows, 50), np.arange(max(rows - 3, 0), rows)]
+    wanted = [name for name in df.columns if name not in EXTRA_COLUMNS]
+    df[wanted] = df[wanted].astype(object)
+    df.loc[blank_rows, wanted] = None
+    with open(path, "wb") as f:
+        f.write(write_xlsx(df))
+
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def run_reader(reader, path, out_path):
+    """Child process body: read once, report seconds and peak RSS growth, pickle the frame."""
+    import pandas as pd
+    from order_reader import read_orders
+
+    columns = wanted_columns()
+    # Start the high-water mark from here, so only the read is measured.
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    rss_before = _status_mb("VmRSS")
+    started = time.perf_counter()
+    if reader == "read_excel":
+        df = pd.read_excel(path, engine="openpyxl")
+        # The old pipeline copied the whole frame for the Zoho and DPD stages.
+        copies = [df.copy(), df.copy()]
+        result = df[[name for name in columns if name in df.columns]]
+        del copies
+    else:
+        result = read_orders(path, columns)
+    seconds = time.perf_counter() - started
+    rss_mb = _status_mb("VmHWM") - rss_before
+    with open(out_path, "wb") as f:
+        pickle.dump(result, f)
+    print(json.dumps({"seconds": seconds, "rss_mb": rss_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", nargs=3, metavar=("READER", "XLSX", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_reader(*args.child)
+        return
+
+    import excel_reader
+    readers = [reader for reader in READERS if reader == "read_excel" or reader in excel_reader.available_engines()]
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "orders.xlsx")
+        make_workbook(args.rows, path, args.seed)
+        frames = {}
+        print(f"{args.rows} rows:")
+        for reader in readers:
+            out_path = os.path.join(scratch, f"{reader}.pkl")
+            env = dict(os.environ, EXCEL_ENGINE="openpyxl" if reader == "read_excel" else reader)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", reader, path, out_path],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            with open(out_path, "rb") as f:
+                frames[reader] = pickle.load(f)
+            print(f"  {reader:<11} {result['seconds']:8.2f}s  +{result['rss_mb']:.0f}MB peak RSS")
+        reference = frames["read_excel"]
+        for reader, frame in frames.items():
+            assert frame.equals(reference), f"{reader} differs from pd.read_excel"
+        print(f"  identical to pd.read_excel: {', '.join(frames)} ({len(reference)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_po_batches.py
+"""Time Nisbets PO batching: the per-batch loop vs assign_batches, batch_lines and render_batch_csvs.
+
+Both sides get the same supplier-order table from the allocator, so the comparison covers
+batching and CSV rendering only. Times are the best of --repeat runs.
+
+    python bench/bench_po_batches.py --lines 50000 --threads 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import po_batches  # noqa: E402
+from allocation import lines_by_order  # noqa: E402
+from legacy import nisbets_batches  # noqa: E402
+from po_batches import assign_batches, batch_lines, render_batch_csvs  # noqa: E402
+
+BATCH_SIZE = 20
+
+
+def make_inputs(lines, seed=0):
+    """Supplier order lines, one to four per order, with a few SKUs that need CSV quoting."""
+    rng = np.random.default_rng(seed)
+    per_order = rng.integers(1, 5, lines)
+    order_numbers = np.repeat(np.arange(lines), per_order)[:lines]
+    skus = np.array([f"SKU{n}" for n in rng.integers(0, 5000, lines)], dtype=object)
+    skus[rng.random(lines) < 0.001] = 'SKU,"quoted"'
+    return pd.DataFrame({
+        'Order number': [f"X{n:09d}-A" for n in order_numbers],
+        'Offer SKU': skus,
+        'Supplier Name': 'Nisbets',
+        'Quantity': rng.integers(1, 12, lines),
+    })
+
+
+def new_path(supplier_orders, pool):
+    batches = assign_batches(supplier_orders, {'Nisbets': BATCH_SIZE})
+    lines = batch_lines(batches)
+    csvs = render_batch_csvs(batches, pool)
+    po_rows = [
+        [{'Order Number': order_no, 'Offer SKU': sku, 'Quantity': qty}
+         for order_no, order_lines in lines[batch][1].items() for sku, qty in order_lines]
+        for batch in csvs
+    ]
+    return list(csvs.values()), po_rows
+
+
+def best_of(repeat, fn, *args):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        secs = time.perf_counter() - started
+        best = secs if best is None else min(best, secs)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=4, help="render pool size; 0 skips the pooled run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    supplier_orders = make_inputs(args.lines, args.seed)
+    old, old_secs = best_of(args.repeat, lambda: nisbets_batches(lines_by_order(supplier_orders), BATCH_SIZE))
+    new, new_secs = best_of(args.repeat, new_path, supplier_orders, None)
+    print(f"{args.lines} lines: loop {old_secs * 1000:.0f}ms, one pass {new_secs * 1000:.0f}ms, identical: {old == new}")
+    if args.threads:
+        # Chunk so the pool is used at this size whatever PARALLEL_RENDER_MIN_ROWS is set to.
+        po_batches.PARALLEL_RENDER_MIN_ROWS = max(1, args.lines // (2 * args.threads))
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            pooled, pooled_secs = best_of(args.repeat, new_path, supplier_orders, pool)
+        print(f"  with a {args.threads}-thread render pool: {pooled_secs * 1000:.0f}ms, identical: {old == pooled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# bench_stock_writeback.py
+"""Time writing remaining stock back onto a stock sheet: the per-SKU loop vs apply_remaining_stock.
+
+    python bench/bench_stock_writeback.py --rows 50000 --shipped 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from allocation import apply_remaining_stock  # noqa: E402
+from legacy import write_remaining_stock  # noqa: E402
+
+
+def make_inputs(rows, shipped, seed=0):
+    """A stock sheet with some duplicate SKUs and remaining stock for shipped SKUs, a few not on the sheet."""
+    rng = np.random.default_rng(seed)
+    skus = np.array([f"SKU{n:07d}" for n in rng.integers(0, int(rows * 0.9), rows)], dtype=object)
+    stock = pd.DataFrame({
+        'Offer SKU': skus,
+        'Quantity': rng.integers(0, 50, rows),
+        'Description': [f"Item {n}" for n in range(rows)],
+    })
+    on_sheet = rng.choice(pd.unique(skus), shipped - shipped // 20, replace=False).tolist()
+    off_sheet = [f"MISSING{n}" for n in range(shipped // 20)]
+    remaining = {sku: int(qty) for sku, qty in zip(on_sheet + off_sheet, rng.integers(-3, 30, shipped))}
+    return stock, remaining
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--shipped", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stock, remaining = make_inputs(args.rows, args.shipped, args.seed)
+    old, old_secs = timed(write_remaining_stock, stock.copy(), list(remaining), remaining)
+    new, new_secs = timed(apply_remaining_stock, stock.copy(), remaining)
+    print(f"{args.rows} rows, {args.shipped} shipped SKUs: loop {old_secs:.2f}s, indexed {new_secs * 1000:.0f}ms, "
+          f"identical: {old.equals(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# legacy.py
+"""The row-by-row implementations the vectorised stages replaced, copied from main.py as
+they were before the rewrite, so the benchmarks can time and compare against them."""
+import math
+from io import StringIO
+
+import pandas as pd
+
+
+def allocate_orders(orders, stock_map):
+    """The old allocation: one iterrows pass consuming stock per SKU in file order.
+
+    orders has Order number, Offer SKU, Quantity and Supplier Name; stock_map is
+    {supplier: {sku: qty}}. Returns (stock_ship_orders, supplier_orders, stock_left, shipped).
+    """
+    stock_left = {k: stock_map[k].copy() for k in stock_map}
+    supplier_orders = {supplier: {} for supplier in stock_map}
+    stock_ship_orders = {}
+    shipped = {supplier: set() for supplier in stock_map}
+    for _, row in orders.iterrows():
+        order_no = row['Order number']
+        sku = row['Offer SKU']
+        qty = int(row['Quantity'])
+        supplier = row['Supplier Name']
+        if supplier not in stock_map:
+            continue
+        in_stock = stock_left[supplier].get(sku, 0)
+        from_stock = min(qty, in_stock)
+        to_supplier = qty - from_stock
+        if from_stock > 0:
+            stock_ship_orders.setdefault(order_no, []).append((sku, from_stock))
+            stock_left[supplier][sku] = max(in_stock - from_stock, 0)
+            shipped[supplier].add(sku)
+        if to_supplier > 0:
+            supplier_orders[supplier].setdefault(order_no, []).append((sku, to_supplier))
+    return stock_ship_orders, supplier_orders, stock_left, shipped
+
+
+def write_remaining_stock(stock_df, shipped, stock_left):
+    """Step 7 of the old upload: one boolean scan of the stock sheet per shipped SKU."""
+    for sku in shipped:
+        if sku in stock_df['Offer SKU'].values:
+            idx = stock_df[stock_df['Offer SKU'] == sku].index[0]
+            stock_df.at[idx, 'Quantity'] = max(stock_left.get(sku, 0), 0)
+    return stock_df
+
+
+def dpd_parcel_rows(orders_df, sku_limits):
+    """The old DPD parcel count: an iterrows pass over every base order's lines."""
+    final_order_rows = []
+    for base, group in orders_df.groupby('base_order'):
+        special_label_count = 0
+        has_special = False
+        has_other = False
+        for _, r in group.iterrows():
+            sku = str(r.get('Offer SKU', '')).strip().upper()
+            qty = int(r.get('Quantity', 1))
+            max_per = sku_limits.get(sku)
+            if max_per is not None:
+                has_special = True
+                special_label_count += math.ceil(qty / int(max_per))
+            else:
+                has_other = True
+        if has_special:
+            total_labels = special_label_count
+            if has_other:
+                total_labels += 1
+            if total_labels == 0:
+                total_labels = 1
+        else:
+            total_labels = 2 if len(group) > 1 else 1
+        if 'A' in group['order_suffix'].values:
+            row = group[group['order_suffix'] == 'A'].iloc[0].copy()
+            row['dpd_parcel_count'] = total_labels
+            final_order_rows.append(row)
+        elif 'B' in group['order_suffix'].values:
+            row = group[group['order_suffix'] == 'B'].iloc[0].copy()
+            row['dpd_parcel_count'] = total_labels
+            final_order_rows.append(row)
+    dpd_final_df = pd.DataFrame(final_order_rows).drop_duplicates('Order number')
+    return dpd_final_df.sort_values("Order number").reset_index(drop=True)
+
+
+DPD_FIELD_MAP = {
+    0:  lambda row: row.get('Order number', ''),
+    1:  lambda row: row.get('Shipping address company', ''),
+    2:  lambda row: row.get('Shipping address company', ''),
+    3:  lambda row: row.get('Shipping address street 1', ''),
+    4:  lambda row: row.get('Shipping address street 2', ''),
+    5:  lambda row: row.get('Shipping address city', ''),
+    6:  lambda row: row.get('Shipping address state', ''),
+    7:  lambda row: row.get('Shipping address zip', ''),
+    8:  lambda row: '372',
+    9:  lambda row: str(row.get('dpd_parcel_count', 1)),
+    10: lambda row: '1',
+    11: lambda row: 'N',
+    12: lambda row: 'O',
+    23: lambda row: row.get('Shipping address first name', ''),
+    24: lambda row: row.get('Shipping address phone', ''),
+    28: lambda row: '8130L3',
+    30: lambda row: 'N',
+    31: lambda row: 'N',
+}
+
+DPD_REQUIRED_FIELDS = [
+    (0, 'Order number'),
+    (1, 'Shipping address company'),
+    (3, 'Shipping address street 1'),
+    (5, 'Shipping address city'),
+    (7, 'Shipping address zip'),
+    (23, 'Shipping address first name'),
+    (24, 'Shipping address phone'),
+]
+
+
+def build_dpd_export(dpd_final_df, dpd_col_count, dpd_delim):
+    """The old DPD export: the per-row field map filled into a full-width row list, then one to_csv."""
+    export_rows = []
+    errors = []
+    for _, row in dpd_final_df.iterrows():
+        row_data = [''] * dpd_col_count
+        missing = []
+        for idx, fname in DPD_REQUIRED_FIELDS:
+            value = DPD_FIELD_MAP[idx](row)
+            if not value or pd.isnull(value) or str(value).strip() == '':
+                missing.append(fname)
+        if missing:
+            errors.append({'Order number': row.get('Order number', ''), 'Missing': ', '.join(missing)})
+            continue
+        for i in range(dpd_col_count):
+            if i in DPD_FIELD_MAP:
+                row_data[i] = DPD_FIELD_MAP[i](row)
+        export_rows.append(row_data)
+    if not export_rows:
+        return None, errors
+    dpd_buffer = StringIO()
+    pd.DataFrame(export_rows).to_csv(dpd_buffer, header=False, index=False, sep=dpd_delim)
+    return dpd_buffer.getvalue(), errors
+
+
+def nisbets_batches(nisbets_orders, max_orders_per_file=20):
+    """The old Nisbets step: cut orders into batches, then one DataFrame and to_csv per batch.
+
+    nisbets_orders is {order number: [(sku, qty), ...]}. Returns ([CSV bytes per batch],
+    [PO map rows per batch]); saving to the PO map is left out.
+    """
+    orders = list(nisbets_orders.keys())
+    batches = [orders[i:i + max_orders_per_file] for i in range(0, len(orders), max_orders_per_file)]
+    csvs, po_rows = [], []
+    for batch in batches:
+        batch_rows = []
+        for order in batch:
+            for sku, qty in nisbets_orders[order]:
+                batch_rows.append({'Order Number': order, 'Offer SKU': sku, 'Quantity': qty})
+        if batch_rows:
+            csv_buffer = StringIO()
+            pd.DataFrame(batch_rows).to_csv(csv_buffer, index=False)
+            csvs.append(csv_buffer.getvalue().encode('utf-8'))
+            po_rows.append(batch_rows)
+    return csvs, po_rows
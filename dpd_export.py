@@ -0,0 +1,181 @@
+# dpd_export.py
+import csv
+import itertools
+import os
+from io import StringIO
+import numpy as np
+import pandas as pd
+
+
+def _sku_limits_per_line(skus: pd.Series, sku_limits: dict) -> np.ndarray:
+    """Max units per parcel for each line (NaN when the SKU has no limit), looked up once per distinct SKU."""
+    codes, uniques = pd.factorize(skus, use_na_sentinel=False)
+    limits = np.empty(len(uniques), dtype=np.float64)
+    for pos, sku in enumerate(uniques):
+        max_per = sku_limits.get(str(sku).strip().upper())
+        limits[pos] = np.nan if max_per is None else int(max_per)
+    return limits[codes]
+
+
+def dpd_parcel_rows(orders_df: pd.DataFrame, sku_limits: dict) -> pd.DataFrame:
+    """One row per base order with its DPD parcel count, sorted by order number.
+
+    orders_df holds the -A/-B order lines with base_order and order_suffix columns. Per base order:
+    every line whose SKU has a max-per-parcel limit needs ceil(qty / limit) labels; if any line has
+    a limit, the order gets the sum of those plus one label when it also has lines without a limit
+    (and never zero); otherwise it gets 2 labels when it has several lines and 1 for a single line.
+    The row kept is the first A line of the order, or the first B line when it has no A line.
+    """
+    lines = orders_df[orders_df['base_order'].notna()]
+    if 'Offer SKU' in lines.columns:
+        skus = lines['Offer SKU']
+    else:
+        skus = pd.Series('', index=lines.index)
+    if 'Quantity' in lines.columns:
+        qty = lines['Quantity'].astype(np.int64).to_numpy()
+    else:
+        qty = np.ones(len(lines), dtype=np.int64)
+    limit = _sku_limits_per_line(skus, sku_limits)
+    special = ~np.isnan(limit)
+    if (limit[special] == 0).any():
+        raise ZeroDivisionError("division by zero")
+    with np.errstate(invalid="ignore"):
+        labels = np.where(special, np.ceil(qty / limit), 0.0)
+
+    per_order = pd.DataFrame({
+        'base_order': lines['base_order'].to_numpy(),
+        'special': special,
+        'other': ~special,
+        'labels': labels,
+    }).groupby('base_order', sort=False).agg(
+        has_special=('special', 'any'),
+        has_other=('other', 'any'),
+        labels=('labels', 'sum'),
+        lines=('labels', 'size'),
+    )
+    special_total = per_order['labels'].to_numpy().astype(np.int64) + per_order['has_other'].to_numpy()
+    special_total = np.where(special_total == 0, 1, special_total)
+    plain_total = np.where(per_order['lines'].to_numpy() > 1, 2, 1)
+    parcel_count = pd.Series(
+        np.where(per_order['has_special'].to_numpy(), special_total, plain_total).astype(np.int64),
+        index=per_order.index,
+    )
+
+    # A lines sort before B lines; the stable sort keeps file order among equals.
+    rows = (
+        lines.assign(_not_a=(lines['order_suffix'] != 'A').to_numpy())
+        .sort_values(['base_order', '_not_a'], kind='stable')
+        .drop_duplicates('base_order')
+        .drop(columns='_not_a')
+    )
+    rows['dpd_parcel_count'] = rows['base_order'].map(parcel_count).to_numpy()
+    return rows.drop_duplicates('Order number').sort_values("Order number").reset_index(drop=True)
+
+
+# Where each DPD import column comes from: a column of the parcel rows, or a fixed value.
+# Positions not listed are left empty.
+DPD_COLUMNS = {
+    0: ('column', 'Order number'),
+    1: ('column', 'Shipping address company'),
+    2: ('column', 'Shipping address company'),
+    3: ('column', 'Shipping address street 1'),
+    4: ('column', 'Shipping address street 2'),
+    5: ('column', 'Shipping address city'),
+    6: ('column', 'Shipping address state'),
+    7: ('column', 'Shipping address zip'),
+    8: ('value', '372'),
+    9: ('column', 'dpd_parcel_count'),
+    10: ('value', '1'),
+    11: ('value', 'N'),
+    12: ('value', 'O'),
+    23: ('column', 'Shipping address first name'),
+    24: ('column', 'Shipping address phone'),
+    28: ('value', '8130L3'),
+    30: ('value', 'N'),
+    31: ('value', 'N'),
+}
+
+# Columns an order cannot be labelled without, in the order they are reported.
+DPD_REQUIRED_COLUMNS = [
+    'Order number',
+    'Shipping address company',
+    'Shipping address street 1',
+    'Shipping address city',
+    'Shipping address zip',
+    'Shipping address first name',
+    'Shipping address phone',
+]
+
+
+def _is_blank(value) -> bool:
+    return not value or pd.isnull(value) or str(value).strip() == ''
+
+
+def _blank_mask(values: pd.Series) -> np.ndarray:
+    """Which values are blank (empty, zero, NaN or whitespace), judged once per distinct value."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    blank = np.fromiter((_is_blank(value) for value in uniques), dtype=bool, count=len(uniques))
+    return blank[codes]
+
+
+def _csv_text(values: list) -> list:
+    """Cell text for one output column as DataFrame.to_csv writes it: dtype inferred from the values, blanks for NaN/NaT."""
+    column = pd.Series(values)
+    missing = column.isna().to_numpy()
+    if column.dtype.kind in 'fM':
+        text = column.astype(str).to_numpy(dtype=object)
+    else:
+        text = np.array([str(value) for value in values], dtype=object)
+    text[missing] = ''
+    return text.tolist()
+
+
+def build_dpd_export(parcel_rows: pd.DataFrame, column_count: int, delimiter: str):
+    """The DPD import CSV for the parcel rows and the orders left out of it.
+
+    Returns (csv text, errors). An order missing any DPD_REQUIRED_COLUMNS value is left out
+    and reported as {'Order number', 'Missing'}; csv text is None when no order is left.
+    Columns are filled from DPD_COLUMNS a whole column at a time and rows go straight to the
+    csv writer; the empty columns after the last mapped one are written as a fixed run of
+    delimiters, so a wide template costs nothing per row. Cells read as DataFrame.to_csv
+    writes them.
+    """
+    n = len(parcel_rows)
+    missing = {}
+    for name in DPD_REQUIRED_COLUMNS:
+        if name in parcel_rows.columns:
+            missing[name] = _blank_mask(parcel_rows[name])
+        else:
+            missing[name] = np.ones(n, dtype=bool)
+    excluded = np.zeros(n, dtype=bool)
+    for mask in missing.values():
+        excluded |= mask
+
+    errors = []
+    if excluded.any():
+        order_numbers = parcel_rows['Order number'].tolist() if 'Order number' in parcel_rows.columns else [''] * n
+        for pos in np.flatnonzero(excluded):
+            errors.append({
+                'Order number': order_numbers[pos],
+                'Missing': ', '.join(name for name, mask in missing.items() if mask[pos]),
+            })
+    rows = parcel_rows[~excluded]
+    if rows.empty:
+        return None, errors
+
+    width = min(column_count, max(DPD_COLUMNS) + 1)
+    cells = [itertools.repeat('')] * width
+    texts = {}
+    for pos, (kind, source) in DPD_COLUMNS.items():
+        if pos >= width:
+            continue
+        if kind == 'value':
+            cells[pos] = itertools.repeat(source)
+        elif source in rows.columns:
+            if source not in texts:
+                texts[source] = _csv_text(rows[source].tolist())
+            cells[pos] = texts[source]
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator=delimiter * (column_count - width) + os.linesep)
+    writer.writerows(itertools.islice(zip(*cells), len(rows)))
+    return buffer.getvalue(), errors
@@ -0,0 +1,88 @@
+# excel_writer.py
+import datetime
+import math
+from io import BytesIO
+import pandas as pd
+import xlsxwriter
+
+# The date formats pandas' to_excel uses, so files read back and look the same.
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+DATE_FORMAT = "YYYY-MM-DD"
+WRITE_CHUNK_ROWS = 10000
+
+
+class _Formats:
+    """Formats created once per workbook and shared by every cell that needs them."""
+
+    def __init__(self, workbook):
+        self.datetime = workbook.add_format({"num_format": DATETIME_FORMAT})
+        self.date = workbook.add_format({"num_format": DATE_FORMAT})
+
+
+def _write_cell(worksheet, row, col, value, formats):
+    if value is None or value is pd.NaT:
+        return
+    kind = type(value)
+    if kind is str:
+        worksheet.write_string(row, col, value)
+    elif kind is bool:
+        worksheet.write_boolean(row, col, value)
+    elif kind is int:
+        worksheet.write_number(row, col, value)
+    elif kind is float:
+        if math.isnan(value):
+            return
+        if math.isinf(value):
+            worksheet.write_string(row, col, "inf" if value > 0 else "-inf")
+        else:
+            worksheet.write_number(row, col, value)
+    elif isinstance(value, datetime.datetime):
+        worksheet.write_datetime(row, col, value, formats.datetime)
+    elif isinstance(value, datetime.date):
+        worksheet.write_datetime(row, col, value, formats.date)
+    elif isinstance(value, (int, float)):
+        _write_cell(worksheet, row, col, float(value) if isinstance(value, float) else int(value), formats)
+    elif pd.isna(value):
+        return
+    else:
+        worksheet.write_string(row, col, str(value))
+
+
+def _column_writer(dtype):
+    """The cell writer for a column, chosen once from its dtype; mixed columns type each cell."""
+    if dtype == bool:
+        return lambda worksheet, row, col, value, formats: worksheet.write_boolean(row, col, value)
+    if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        return lambda worksheet, row, col, value, formats: worksheet.write_number(row, col, value)
+    return _write_cell
+
+
+def write_xlsx(df: pd.DataFrame, sheet_name: str = "Sheet1", chunk_rows: int = WRITE_CHUNK_ROWS) -> bytes:
+    """Write a DataFrame (without its index) as xlsx bytes, row by row in constant memory.
+
+    xlsxwriter's constant_memory mode flushes each row to disk as soon as the next one starts,
+    so the worksheet itself takes no memory per row; what remains is one chunk of values and
+    the compressed file, which is returned as bytes. It needs cells in row order, which
+    pandas' own writer does not produce, hence this writer. Values are pulled chunk_rows rows
+    at a time. Cells are typed as pandas writes them: blanks for NaN/None/NaT, numbers,
+    booleans, dates with pandas' default formats, and everything else as text (never as a
+    formula).
+    """
+    buffer = BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    formats = _Formats(workbook)
+    worksheet = workbook.add_worksheet(sheet_name)
+    for col, name in enumerate(df.columns):
+        if isinstance(name, (int, float)) and not isinstance(name, bool):
+            worksheet.write_number(0, col, name)
+        else:
+            worksheet.write_string(0, col, str(name))
+    writers = [_column_writer(dtype) for dtype in df.dtypes]
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = [chunk.iloc[:, pos].tolist() for pos in range(chunk.shape[1])]
+        for row, values in enumerate(zip(*columns), start=start + 1):
+            for col, value in enumerate(values):
+                writers[col](worksheet, row, col, value, formats)
+    workbook.close()
+    return buffer.getvalue()
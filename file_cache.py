@@ -0,0 +1,174 @@
+# file_cache.py
+import json
+import os
+import tempfile
+import threading
+import time
+from graph_client import get_graph_client
+
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "caterboss_graph_cache"))
+GRAPH_CACHE_MAX_MB = int(os.getenv("GRAPH_CACHE_MAX_MB", "200"))
+
+
+class DriveFileCache:
+    """On-disk cache of OneDrive file bytes keyed by drive item id and validated against the item's cTag/eTag.
+
+    Each item is stored as <item_id>.bin plus a <item_id>.json sidecar with its tags, so several
+    uvicorn workers can share one cache directory without a shared index file.
+    """
+
+    def __init__(self, cache_dir: str = GRAPH_CACHE_DIR, max_bytes: int = GRAPH_CACHE_MAX_MB * 1024 * 1024, client=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._client = client
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served_from_disk = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def client(self):
+        return self._client or get_graph_client()
+
+    def _paths(self, item_id: str):
+        base = os.path.join(self.cache_dir, item_id)
+        return base + ".bin", base + ".json"
+
+    def _read_meta(self, item_id: str):
+        data_path, meta_path = self._paths(item_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(data_path):
+            return None
+        return meta
+
+    def item_metadata(self, drive_id: str, item_id: str) -> dict:
+        """Fetch the small metadata record Graph keeps for an item (no file content)."""
+        resp = self.client.get(f"/drives/{drive_id}/items/{item_id}", params={"$select": "id,eTag,cTag,size"})
+        resp.raise_for_status()
+        return resp.json()
+
+    def current_tag(self, drive_id: str, item_id: str) -> str:
+        """Return the live content tag of an item; changes whenever the file content changes."""
+        meta = self.item_metadata(drive_id, item_id)
+        return meta.get("cTag") or meta.get("eTag")
+
+    def cached_tag(self, item_id: str):
+        meta = self._read_meta(item_id)
+        return meta["tag"] if meta else None
+
+    def get_bytes(self, drive_id: str, item_id: str) -> bytes:
+        """Return the item's content, downloading it only when the cached copy is missing or stale."""
+        return self.get(drive_id, item_id)[0]
+
+    def get(self, drive_id: str, item_id: str):
+        """Return (content, tag), revalidating the cached copy against Graph first."""
+        tag = self.current_tag(drive_id, item_id)
+        return self.get_tagged(drive_id, item_id, tag), tag
+
+    def get_tagged(self, drive_id: str, item_id: str, tag: str) -> bytes:
+        """Return the content for a tag already fetched from Graph, from disk when it matches."""
+        meta = self._read_meta(item_id)
+        data_path, _ = self._paths(item_id)
+        if meta and meta.get("tag") == tag:
+            try:
+                with open(data_path, "rb") as f:
+                    content = f.read()
+                os.utime(data_path)
+                with self._lock:
+                    self.hits += 1
+                    self.bytes_served_from_disk += len(content)
+                return content
+            except OSError:
+                pass
+        with self._lock:
+            self.misses += 1
+        resp = self.client.get(f"/drives/{drive_id}/items/{item_id}/content")
+        resp.raise_for_status()
+        self.store(item_id, resp.content, tag)
+        return resp.content
+
+    def store(self, item_id: str, content: bytes, tag: str) -> None:
+        """Write content and its tag to disk atomically, then trim the cache to its byte budget."""
+        if not tag:
+            return
+        data_path, meta_path = self._paths(item_id)
+        fd, tmp_data = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_data, data_path)
+        fd, tmp_meta = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"item_id": item_id, "tag": tag, "size": len(content), "stored_at": time.time()}, f)
+        os.replace(tmp_meta, meta_path)
+        self._evict()
+
+    def store_upload(self, item_id: str, content: bytes, resp) -> None:
+        """Cache bytes we just PUT to OneDrive, using the tag from Graph's upload response."""
+        try:
+            item = resp.json()
+        except ValueError:
+            return
+        self.store(item_id, content, item.get("cTag") or item.get("eTag"))
+
+    def invalidate(self, item_id: str) -> None:
+        for path in self._paths(item_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name[:-4]))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        # Least recently used first: a hit touches the .bin file's mtime.
+        for _, size, item_id in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.invalidate(item_id)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_served_from_disk": self.bytes_served_from_disk,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_file_cache() -> DriveFileCache:
+    """Return the process-wide OneDrive file cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DriveFileCache()
+        return _cache
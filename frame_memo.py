@@ -0,0 +1,135 @@
+# frame_memo.py
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+from file_cache import get_file_cache
+from snapshots import get_snapshot_store
+
+FRAME_MEMO_MAX_MB = int(os.getenv("FRAME_MEMO_MAX_MB", "256"))
+
+
+def _copy_on_write_enabled() -> bool:
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return bool(pd.get_option("mode.copy_on_write"))
+
+
+def footprint(obj) -> int:
+    """Approximate bytes held by a memoised object."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    return sys.getsizeof(obj)
+
+
+class FrameMemo:
+    """In-process LRU of parsed DataFrames and derived dicts keyed by (item id, tag, kind).
+
+    The tag is the OneDrive cTag, so a changed file can never be served from an old parse.
+    DataFrames are handed out as copies that share memory until a caller writes to them
+    (pandas copy-on-write); on pandas versions without copy-on-write they are deep copies.
+    Derived dicts are shared and must be treated as read-only by callers.
+    """
+
+    def __init__(self, max_bytes: int = FRAME_MEMO_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _hand_out(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            return obj.copy(deep=not _copy_on_write_enabled())
+        return obj
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._hand_out(entry[0])
+
+    def put(self, key, obj):
+        size = footprint(obj)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            # Entries for an older tag of the same item and kind can never be hit again.
+            for stale in [k for k in self._entries if k[0] == key[0] and k[2] == key[2]]:
+                self.bytes -= self._entries.pop(stale)[1]
+            if size <= self.max_bytes:
+                self._entries[key] = (obj, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return self._hand_out(obj)
+
+    def get_or_build(self, key, build):
+        obj = self.get(key)
+        if obj is not None:
+            return obj
+        with self._lock:
+            self.misses += 1
+        return self.put(key, build())
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+def get_frame_memo() -> FrameMemo:
+    """Return the process-wide parsed-frame memo."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = FrameMemo()
+        return _memo
+
+
+def load_parsed(drive_id: str, item_id: str, kind: str, parse):
+    """Return parse(content) for a OneDrive item, skipping both download and parse when its tag is unchanged.
+
+    DataFrames are also kept as on-disk snapshots, so a new process or another worker opens
+    an unchanged file from its snapshot instead of downloading and parsing it.
+    """
+    cache = get_file_cache()
+    tag = cache.current_tag(drive_id, item_id)
+    return get_frame_memo().get_or_build((item_id, tag, kind), lambda: parse_snapshotted(
+        item_id, kind, tag, lambda: parse(cache.get_tagged(drive_id, item_id, tag))
+    )), tag
+
+
+def parse_snapshotted(item_id: str, kind: str, tag: str, build):
+    """The snapshot for this tag if there is one, else build() - snapshotted when it is a DataFrame."""
+    snapshots = get_snapshot_store()
+    df = snapshots.load(item_id, kind, tag)
+    if df is not None:
+        return df
+    obj = build()
+    if isinstance(obj, pd.DataFrame):
+        snapshots.save(item_id, kind, tag, obj)
+    return obj
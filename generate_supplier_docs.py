@@ -1,10 +1,10 @@
 from fastapi import UploadFile, File, HTTPException
 from fastapi.responses import FileResponse
-from io import BytesIO
 from tempfile import TemporaryDirectory
 import pandas as pd
 import os
 import zipfile
+from excel_reader import read_xlsx
 from main import download_excel_file, download_csv_file, STOCK_FILE_IDS, SUPPLIER_FILE_ID
 
 # Aliases for SKU detection (uppercase keys)
@@ -22,7 +22,7 @@ QTY_ALIASES = ["QUANTITY", "QTY", "QTY.", "QTY ORDERED"]
 @app.post("/generate-docs/")
 async def generate_docs(file: UploadFile = File(...)):
     try:
-        uploaded_orders = pd.read_excel(BytesIO(await file.read()))
+        uploaded_orders = read_xlsx(await file.read())
 
         # Normalize columns to uppercase for detection
         normalized_columns = {col.strip().upper(): col for col in uploaded_orders.columns}
@@ -1,33 +1,114 @@
 # graph_auth.py
 import os
+import threading
+import time
 import requests
 
+# Refresh the token this many seconds before Graph says it expires, so a token
+# handed out is never about to die in the middle of a download or upload.
+TOKEN_REFRESH_MARGIN = 300
+
+
+class TokenProvider:
+    """Caches a client-credentials token for Microsoft Graph until shortly before it expires."""
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.fetch_seconds = 0.0
+
+    def _is_fresh(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    def get_token(self) -> str:
+        """Return a valid token, fetching a new one at most once when many callers need it at the same time."""
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._token
+            # Only one caller refreshes; the others wait on the lock and then hit the fresh token.
+            self.misses += 1
+            started = time.perf_counter()
+            token, expires_in = self._fetch_token()
+            self.fetch_seconds += time.perf_counter() - started
+            self._token = token
+            self._expires_at = time.monotonic() + max(expires_in - self.refresh_margin, 0)
+            return token
+
+    def invalidate(self) -> None:
+        """Drop the cached token, e.g. after Graph rejected it with HTTP 401."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        avg_fetch_ms = (self.fetch_seconds / self.misses * 1000) if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "avg_fetch_ms": round(avg_fetch_ms, 1),
+            "saved_ms_estimate": round(avg_fetch_ms * self.hits, 1),
+        }
+
+    def _fetch_token(self):
+        token_url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": "https://graph.microsoft.com/.default"
+        }
+
+        response = self._session.post(token_url, data=data)
+        if response.status_code != 200:
+            try:
+                error_json = response.json()
+                error_msg = error_json.get("error_description") or error_json.get("error", {}).get("message", "")
+            except ValueError:
+                error_msg = ""
+            raise Exception(f"Failed to obtain access token (HTTP {response.status_code}): {error_msg}")
+
+        body = response.json()
+        token = body.get("access_token")
+        if not token:
+            raise Exception("Authentication response did not contain an access token")
+        return token, int(body.get("expires_in", 3599))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def configure_token_provider(tenant_id: str, client_id: str, client_secret: str) -> TokenProvider:
+    """Install the process-wide token provider used by every Graph helper."""
+    global _provider
+    with _provider_lock:
+        _provider = TokenProvider(tenant_id, client_id, client_secret)
+        return _provider
+
+
+def get_token_provider() -> TokenProvider:
+    """Return the shared token provider, building it from the environment on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            tenant_id = os.getenv("TENANT_ID")
+            client_id = os.getenv("CLIENT_ID")
+            client_secret = os.getenv("CLIENT_SECRET")
+            if not tenant_id or not client_id or not client_secret:
+                raise RuntimeError("Missing TENANT_ID, CLIENT_ID, or CLIENT_SECRET environment variables")
+            _provider = TokenProvider(tenant_id, client_id, client_secret)
+        return _provider
+
+
 def get_access_token() -> str:
     """Get an OAuth2 access token for Microsoft Graph using client credentials."""
-    tenant_id = os.getenv("TENANT_ID")
-    client_id = os.getenv("CLIENT_ID")
-    client_secret = os.getenv("CLIENT_SECRET")
-    if not tenant_id or not client_id or not client_secret:
-        raise RuntimeError("Missing TENANT_ID, CLIENT_ID, or CLIENT_SECRET environment variables")
-
-    token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "scope": "https://graph.microsoft.com/.default"
-    }
-
-    response = requests.post(token_url, data=data)
-    if response.status_code != 200:
-        try:
-            error_json = response.json()
-            error_msg = error_json.get("error_description") or error_json.get("error", {}).get("message", "")
-        except ValueError:
-            error_msg = ""
-        raise Exception(f"Failed to obtain access token (HTTP {response.status_code}): {error_msg}")
-    
-    token = response.json().get("access_token")
-    if not token:
-        raise Exception("Authentication response did not contain an access token")
-    return token
+    return get_token_provider().get_token()
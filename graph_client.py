@@ -0,0 +1,85 @@
+# graph_client.py
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from graph_auth import get_token_provider
+
+GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "10"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "10"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "120"))
+
+
+class GraphClient:
+    """One keep-alive session to graph.microsoft.com shared by every download and upload helper."""
+
+    def __init__(self, pool_size: int = GRAPH_POOL_SIZE, connect_timeout: float = GRAPH_CONNECT_TIMEOUT,
+                 read_timeout: float = GRAPH_READ_TIMEOUT, base_url: str = GRAPH_BASE, token_provider=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self._token_provider = token_provider
+        self.session = requests.Session()
+        # Connection failures are retried because nothing has reached Graph yet;
+        # reads and statuses are not, so a PUT is never sent twice.
+        retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("https://", adapter)
+
+    @property
+    def token_provider(self):
+        # Resolved lazily so main.py can install its configured provider after import.
+        return self._token_provider or get_token_provider()
+
+    def url(self, path: str) -> str:
+        if path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, headers: dict = None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        provider = self.token_provider
+        resp = self.session.request(method, url, headers=self._headers(provider, headers), **kwargs)
+        if resp.status_code == 401:
+            # Token revoked or expired early: fetch a new one and try once more.
+            provider.invalidate()
+            resp = self.session.request(method, url, headers=self._headers(provider, headers), **kwargs)
+        return resp
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    @staticmethod
+    def _headers(provider, extra: dict = None) -> dict:
+        headers = {"Authorization": f"Bearer {provider.get_token()}"}
+        if extra:
+            headers.update(extra)
+        return headers
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_graph_client() -> GraphClient:
+    """Return the process-wide pooled Graph client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GraphClient()
+        return _client
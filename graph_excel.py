@@ -2,29 +2,29 @@
 import requests
 import pandas as pd
 from io import BytesIO
-from graph_auth import get_access_token
+from openpyxl.utils import get_column_letter
+from graph_client import get_graph_client
+from excel_reader import read_xlsx
+from excel_writer import write_xlsx
+from frame_memo import load_parsed
 
 SITE_ID = "caterboss.sharepoint.com,798d8a1b-c8b4-493e-b320-be94a4c165a1,ec07bde5-4a37-459a-92ef-a58100f17191"
 DRIVE_ID = "b!udRZ7OsrmU61CSAYEn--q1fPtuPR3TZAs"
 
-def download_excel_file(drive_id: str, item_id: str) -> pd.DataFrame:
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/content"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
-    if resp.status_code != 200:
-        _handle_graph_error(resp, "download Excel file")
+def _parse_excel(content: bytes) -> pd.DataFrame:
     try:
-        df = pd.read_excel(BytesIO(resp.content))
+        return read_xlsx(content)
     except Exception as e:
         raise Exception(f"Failed to parse Excel file content: {e}")
-    return df
+
+def download_excel_file(drive_id: str, item_id: str) -> pd.DataFrame:
+    try:
+        return load_parsed(drive_id, item_id, "xlsx", _parse_excel)[0]
+    except requests.HTTPError as e:
+        _handle_graph_error(e.response, "download Excel file")
 
 def download_csv_file(drive_id: str, item_id: str) -> pd.DataFrame:
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/content"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
+    resp = get_graph_client().get(f"/drives/{drive_id}/items/{item_id}/content")
     if resp.status_code != 200:
         _handle_graph_error(resp, "download CSV file")
     try:
@@ -34,25 +34,17 @@ def download_csv_file(drive_id: str, item_id: str) -> pd.DataFrame:
     return df
 
 def update_excel_file(drive_id: str, item_id: str, df: pd.DataFrame) -> None:
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/content"
-    headers = {"Authorization": f"Bearer {token}"}
-    buffer = BytesIO()
+    url = f"/drives/{drive_id}/items/{item_id}/content"
     try:
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False)
+        data = write_xlsx(df)
     except Exception as e:
         raise Exception(f"Failed to write DataFrame to Excel format: {e}")
-    buffer.seek(0)
-    resp = requests.put(url, headers=headers, data=buffer.read())
+    resp = get_graph_client().put(url, data=data)
     if resp.status_code not in (200, 201):
         _handle_graph_error(resp, "update Excel file")
 
 def upload_csv_file(drive_id: str, path: str, content: bytes) -> str:
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{path}:/content"
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.put(url, headers=headers, data=content)
+    resp = get_graph_client().put(f"/drives/{drive_id}/root:/{path}:/content", data=content)
     if resp.status_code not in (200, 201):
         _handle_graph_error(resp, "upload CSV file")
     try:
@@ -65,11 +57,9 @@ def upload_csv_file(drive_id: str, path: str, content: bytes) -> str:
     return new_id
 
 def read_sheet_data(file_id, sheet_name="Sheet1"):
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/sites/{SITE_ID}/drives/{DRIVE_ID}/items/{file_id}/workbook/worksheets('{sheet_name}')/usedRange"
-    headers = {"Authorization": f"Bearer {token}"}
+    url = f"/sites/{SITE_ID}/drives/{DRIVE_ID}/items/{file_id}/workbook/worksheets('{sheet_name}')/usedRange"
 
-    response = requests.get(url, headers=headers)
+    response = get_graph_client().get(url)
     if response.status_code != 200:
         raise Exception(f"Failed to read sheet: {response.text}")
 
@@ -83,6 +73,130 @@ def read_sheet_data(file_id, sheet_name="Sheet1"):
     df.columns = [str(c).strip().upper() for c in df.columns]
     return df
 
+# ---------- WORKBOOK DELTA WRITES ----------
+# Unchanged rows we are willing to rewrite to join two runs of changed rows into one PATCH.
+DELTA_MERGE_GAP = 20
+# Beyond this many PATCH calls a full-file upload is cheaper, so the caller should fall back.
+DELTA_MAX_RANGES = 40
+
+def _workbook_url(drive_id: str, item_id: str) -> str:
+    return f"/drives/{drive_id}/items/{item_id}/workbook"
+
+def _worksheet_url(drive_id: str, item_id: str, sheet_name: str) -> str:
+    quoted = sheet_name.replace("'", "''")
+    return f"{_workbook_url(drive_id, item_id)}/worksheets('{quoted}')"
+
+def create_workbook_session(drive_id: str, item_id: str, persist_changes: bool = True) -> str:
+    resp = get_graph_client().post(f"{_workbook_url(drive_id, item_id)}/createSession", json={"persistChanges": persist_changes})
+    if resp.status_code not in (200, 201):
+        _handle_graph_error(resp, "create workbook session")
+    return resp.json()["id"]
+
+def close_workbook_session(drive_id: str, item_id: str, session_id: str) -> None:
+    # Best effort: an unclosed session simply expires on the Graph side.
+    try:
+        get_graph_client().post(f"{_workbook_url(drive_id, item_id)}/closeSession", headers={"workbook-session-id": session_id})
+    except Exception:
+        pass
+
+def _cell_key(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def _json_cell(value):
+    if value is None or pd.isna(value):
+        return ""
+    return value.item() if hasattr(value, "item") else value
+
+def contiguous_runs(positions, merge_gap: int = 0) -> list:
+    """Group sorted row positions into (first, last) runs, joining runs at most merge_gap rows apart."""
+    runs = []
+    for pos in positions:
+        if runs and pos - runs[-1][1] <= merge_gap + 1:
+            runs[-1][1] = pos
+        else:
+            runs.append([pos, pos])
+    return [tuple(run) for run in runs]
+
+def sheet_layout_matches(drive_id: str, item_id: str, session_id: str, df: pd.DataFrame, key_col: str):
+    """Return the first worksheet's name if it holds df exactly as read (header in row 1, one row per df row), else None."""
+    client = get_graph_client()
+    headers = {"workbook-session-id": session_id}
+    resp = client.get(f"{_workbook_url(drive_id, item_id)}/worksheets", params={"$select": "name", "$top": "1"}, headers=headers)
+    if resp.status_code != 200:
+        _handle_graph_error(resp, "list worksheets")
+    sheets = resp.json().get("value", [])
+    if not sheets:
+        return None
+    sheet_name = sheets[0]["name"]
+    ws_url = _worksheet_url(drive_id, item_id, sheet_name)
+
+    resp = client.get(f"{ws_url}/usedRange(valuesOnly=true)", params={"$select": "address,rowCount,columnCount"}, headers=headers)
+    if resp.status_code != 200:
+        _handle_graph_error(resp, "read used range")
+    used = resp.json()
+    if not used.get("address", "").split("!")[-1].startswith("A1:"):
+        return None
+    if used.get("rowCount") != len(df) + 1 or used.get("columnCount") != len(df.columns):
+        return None
+
+    last_col = get_column_letter(len(df.columns))
+    resp = client.get(f"{ws_url}/range(address='A1:{last_col}1')", params={"$select": "values"}, headers=headers)
+    if resp.status_code != 200:
+        _handle_graph_error(resp, "read header row")
+    header = resp.json().get("values", [[]])[0]
+    if [_cell_key(v) for v in header] != [_cell_key(c) for c in df.columns]:
+        return None
+
+    if len(df):
+        key_letter = get_column_letter(df.columns.get_loc(key_col) + 1)
+        resp = client.get(f"{ws_url}/range(address='{key_letter}2:{key_letter}{len(df) + 1}')", params={"$select": "values"}, headers=headers)
+        if resp.status_code != 200:
+            _handle_graph_error(resp, "read key column")
+        sheet_keys = [_cell_key(row[0]) for row in resp.json().get("values", [])]
+        if sheet_keys != [_cell_key(v) for v in df[key_col].tolist()]:
+            return None
+    return sheet_name
+
+def write_column_delta(drive_id: str, item_id: str, df: pd.DataFrame, previous: pd.Series, value_col: str, key_col: str) -> bool:
+    """PATCH only the changed cells of value_col through the workbook range API, inside one workbook session.
+
+    previous holds value_col as it was when df was read. Returns False without writing anything
+    when the sheet layout does not match df or the change is too scattered, so the caller can
+    upload the full file instead.
+    """
+    after = df[value_col]
+    unchanged = (after.to_numpy() == previous.to_numpy()) | (after.isna().to_numpy() & previous.isna().to_numpy())
+    positions = [i for i, same in enumerate(unchanged) if not same]
+    if not positions:
+        return True
+    runs = contiguous_runs(positions, DELTA_MERGE_GAP)
+    if len(runs) > DELTA_MAX_RANGES:
+        return False
+
+    client = get_graph_client()
+    session_id = create_workbook_session(drive_id, item_id)
+    try:
+        sheet_name = sheet_layout_matches(drive_id, item_id, session_id, df, key_col)
+        if sheet_name is None:
+            return False
+        ws_url = _worksheet_url(drive_id, item_id, sheet_name)
+        col = get_column_letter(df.columns.get_loc(value_col) + 1)
+        for first, last in runs:
+            # Row 1 is the header, so DataFrame position p lives in Excel row p + 2.
+            address = f"{col}{first + 2}:{col}{last + 2}"
+            values = [[_json_cell(v)] for v in after.iloc[first:last + 1].tolist()]
+            resp = client.patch(f"{ws_url}/range(address='{address}')", json={"values": values},
+                                headers={"workbook-session-id": session_id})
+            if resp.status_code != 200:
+                _handle_graph_error(resp, f"update range {address}")
+        return True
+    finally:
+        close_workbook_session(drive_id, item_id, session_id)
+
 def _handle_graph_error(response: requests.Response, action: str):
     status = response.status_code
     try:
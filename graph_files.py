@@ -1,37 +1,50 @@
+import requests
 import pandas as pd
-from io import BytesIO
-from graph_api_auth import get_graph_client
+from graph_client import get_graph_client
+from excel_reader import read_xlsx
+from excel_writer import write_xlsx
+from frame_memo import load_parsed
 
 # Define the function to update stock
 
+def upsert_stock(stock_df: pd.DataFrame, items: dict, sku_col: str = "SKU", qty_col: str = "QTY"):
+    """Set quantities for existing SKUs and append new ones in one pass.
+
+    SKUs are matched on their stripped string form; every matching row is updated.
+    When several incoming keys strip to the same SKU the last quantity wins, as it did
+    when items were applied one at a time. Returns (stock_df, summary).
+    """
+    if not items:
+        return stock_df, {"updated": 0, "inserted": 0, "rows_updated": 0}
+    incoming = pd.DataFrame({"sku": list(items.keys()), "qty": list(items.values())})
+    incoming["key"] = incoming["sku"].astype(str).str.strip()
+    per_key = incoming.groupby("key", sort=False).agg(sku=("sku", "first"), qty=("qty", "last"))
+
+    keys = stock_df[sku_col].astype(str).str.strip()
+    hit = keys.isin(per_key.index)
+    if hit.any():
+        stock_df.loc[hit, qty_col] = keys[hit].map(per_key["qty"]).to_numpy()
+
+    new = per_key[~per_key.index.isin(keys)]
+    if len(new):
+        new_rows = pd.DataFrame({sku_col: new["sku"].to_numpy(), qty_col: new["qty"].to_numpy()})
+        stock_df = pd.concat([stock_df, new_rows], ignore_index=True)
+    return stock_df, {"updated": len(per_key) - len(new), "inserted": len(new), "rows_updated": int(hit.sum())}
+
 def upload_stock_update(stock_df: pd.DataFrame, items: dict) -> pd.DataFrame:
-    updated_rows = 0
-    for sku, quantity in items.items():
-        match = stock_df[stock_df["SKU"].astype(str).str.strip() == str(sku).strip()]
-        if not match.empty:
-            stock_df.loc[match.index, "QTY"] = quantity
-            updated_rows += 1
-        else:
-            new_row = pd.DataFrame({"SKU": [sku], "QTY": [quantity]})
-            stock_df = pd.concat([stock_df, new_row], ignore_index=True)
-            updated_rows += 1
-    return stock_df
+    return upsert_stock(stock_df, items)[0]
 
 
 def download_excel_file(drive_id: str, file_id: str) -> pd.DataFrame:
-    client = get_graph_client()
-    response = client.get(f"/drives/{drive_id}/items/{file_id}/content")
-    if response.status_code != 200:
+    try:
+        return load_parsed(drive_id, file_id, "xlsx", read_xlsx)[0]
+    except requests.HTTPError:
         raise Exception("Failed to download Excel file from OneDrive")
-    return pd.read_excel(BytesIO(response.content), engine="openpyxl")
 
 
 def update_excel_file(drive_id: str, file_id: str, df: pd.DataFrame):
     client = get_graph_client()
-    buffer = BytesIO()
-    df.to_excel(buffer, index=False, engine="openpyxl")
-    buffer.seek(0)
     upload_url = f"/drives/{drive_id}/items/{file_id}/content"
-    response = client.put(upload_url, data=buffer.read())
+    response = client.put(upload_url, data=write_xlsx(df))
     if response.status_code not in (200, 201):
         raise Exception("Failed to upload updated Excel file to OneDrive")
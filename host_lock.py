@@ -0,0 +1,44 @@
+# host_lock.py
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so the lock only covers this process
+    fcntl = None
+
+
+class HostLock:
+    """A lock held against other threads of this process and, through an flock on a lock
+    file, against every other process on the host (e.g. the other uvicorn workers).
+
+    Not re-entrant: a thread that already holds it must not take it again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is None:
+            return self
+        try:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if self._file is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+        finally:
+            self._lock.release()
+        return False
@@ -0,0 +1,154 @@
+# jobs.py
+import os
+import threading
+import time
+from workers import job_pool
+
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+
+class Job:
+    """One queued run of a long pipeline, with its current stage and per-stage timings.
+
+    The pipeline reports progress by calling job.progress(stage_name) as each stage starts;
+    the previous stage is closed and timed at that point. version increases on every change,
+    so pollers and event streams can tell when there is something new to send.
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"
+        self.stage = None
+        self.stages = []
+        self.error = None
+        self.result = None
+        self.info = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.future = None
+        self._stage_started = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def _changed(self):
+        self.version += 1
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                print(f"Job {self.id} listener failed: {e}")
+
+    def _close_stage(self, now):
+        if self.stage is not None:
+            self.stages.append({"name": self.stage, "seconds": round(now - self._stage_started, 3)})
+
+    def progress(self, stage: str) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self._close_stage(now)
+            self.stage = stage
+            self._stage_started = now
+        self._changed()
+
+    def _start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+        self._changed()
+
+    def _finish(self, result=None, error=None):
+        with self._lock:
+            self._close_stage(time.perf_counter())
+            self.stage = None
+            self.result = result
+            self.error = error
+            self.status = "failed" if error else "done"
+            self.finished_at = time.time()
+        self._changed()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": list(self.stages),
+                "elapsed_seconds": elapsed,
+                "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+                "error": self.error,
+                "version": self.version,
+                **self.info,
+            }
+
+
+class JobQueue:
+    """Runs jobs on the job pool and keeps them in memory until JOB_RETENTION_HOURS after they finish.
+
+    listeners are called with the job on every status or stage change, e.g. to persist its state
+    somewhere other workers can read it.
+    """
+
+    def __init__(self, pool=job_pool, retention_seconds: float = JOB_RETENTION_HOURS * 3600):
+        self._pool = pool
+        self.retention_seconds = retention_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.listeners = []
+        self.submitted = 0
+        self.failed = 0
+
+    def submit(self, job_id: str, fn, *args, **kwargs) -> Job:
+        """Queue fn(*args, job=job, **kwargs); its return value becomes job.result."""
+        job = Job(job_id)
+        job._listeners = list(self.listeners)
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+            self.submitted += 1
+        job._changed()
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job._start()
+        try:
+            result = fn(*args, job=job, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            job._finish(error=str(e))
+            print(f"Job {job.id} failed: {e}")
+            raise
+        job._finish(result=result)
+        timings = ", ".join(f"{s['name']} {s['seconds']:.2f}s" for s in job.stages)
+        print(f"Job {job.id} finished in {job.finished_at - job.started_at:.2f}s ({timings})")
+        return result
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "submitted": self.submitted,
+            "failed": self.failed,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "retained": len(statuses),
+        }
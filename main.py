@@ -1,16 +1,41 @@
 import os
-import requests
+import asyncio
 import pandas as pd
 from fastapi import FastAPI, File, UploadFile, Request, Form
-from fastapi.responses import HTMLResponse, StreamingResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, RedirectResponse, FileResponse, JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
-from io import BytesIO, StringIO
+from io import BytesIO
 from datetime import datetime
 import tempfile
 import json
+import functools
 import random
 import string
+import time
+from concurrent.futures import wait
+from graph_auth import configure_token_provider
+from graph_client import get_graph_client
+from workers import run_blocking, prefetch_pool, render_pool
+from jobs import JobQueue
+from host_lock import HostLock
+from file_cache import get_file_cache
+from frame_memo import get_frame_memo, load_parsed
+from snapshots import get_snapshot_store
+from allocation import allocate_orders, apply_remaining_stock
+from po_batches import assign_batches, batch_lines, render_batch_csvs, zip_files
+from suppliers import Supplier, SupplierRegistry
+from excel_reader import read_xlsx, benchmark_engines, select_engine
+from excel_writer import write_xlsx
+from template_registry import TemplateRegistry, zoho_layout, dpd_layout
+from dpd_export import build_dpd_export, dpd_parcel_rows
+from zoho_export import build_zoho_export
+from order_reader import ORDER_LINE_COLUMNS, read_orders, compact_order_lines
+from graph_excel import write_column_delta
+from po_map_store import PoMapStore
+from po_index import PoIndex
+from artifact_store import get_artifact_store, new_run_id
+from upload_ledger import get_upload_ledger, upload_digest
 
 # ---------- CONFIGURATION ----------
 TENANT_ID = os.getenv("TENANT_ID", "ce280aae-ee92-41fe-ab60-66b37ebc97dd")
@@ -22,92 +47,111 @@ NISBETS_STOCK_FILE_ID = os.getenv("NISBETS_STOCK_FILE_ID", "01YTGSV5HJCNBDXINJP5
 NORTONS_STOCK_FILE_ID = os.getenv("NORTONS_STOCK_FILE_ID", "01YTGSV5FBVS7JYODGLREKL273FSJ3XRLP")
 SKU_MAX_FILE_ID = os.getenv("SKU_MAX_FILE_ID", "01YTGSV5DOW27RMJGS3JA2IODH6HCF4647")
 PO_MAP_FILE_ID = os.getenv("PO_MAP_FILE_ID", "01YTGSV5D4WTSUTV3D7FGKT6YKUKV4BIYI")
+# Suppliers order lines are routed to, in the order their orders are shown. SUPPLIERS, a JSON
+# list of the same shape, replaces them; export is "text" or "po_csv" (see suppliers.py).
+DEFAULT_SUPPLIERS = [
+    {"name": "Nortons", "stock_file_id": NORTONS_STOCK_FILE_ID, "export": "text"},
+    {"name": "Nisbets", "stock_file_id": NISBETS_STOCK_FILE_ID, "batch_size": 20, "export": "po_csv"},
+]
+SUPPLIERS = json.loads(os.getenv("SUPPLIERS") or "null") or DEFAULT_SUPPLIERS
 ZOHO_TEMPLATE_PATH = "column format.xlsx"
 DPD_TEMPLATE_PATH = "DPD.Import(1).csv"
-SESSION_UNIQUE = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+# Order file columns the DPD export reads.
+DPD_SOURCE_COLUMNS = [
+    'Order number', 'Offer SKU', 'Quantity', 'Shipping address company',
+    'Shipping address street 1', 'Shipping address street 2', 'Shipping address city',
+    'Shipping address state', 'Shipping address zip', 'Shipping address first name',
+    'Shipping address phone',
+]
+# "delta" patches only changed Quantity cells through the workbook API; "full" re-uploads the whole file.
+STOCK_WRITE_MODE = os.getenv("STOCK_WRITE_MODE", "delta")
+# Held by an order run from reading the stock sheets to writing them back, across every worker on the host.
+ORDER_RUN_LOCK_PATH = os.getenv("ORDER_RUN_LOCK_PATH", os.path.join(tempfile.gettempdir(), "caterboss_order_run.lock"))
+
+token_provider = configure_token_provider(TENANT_ID, CLIENT_ID, CLIENT_SECRET)
+
+graph = get_graph_client()
+file_cache = get_file_cache()
+frame_memo = get_frame_memo()
+artifact_store = get_artifact_store()
+job_queue = JobQueue()
+upload_ledger = get_upload_ledger()
+order_run_lock = HostLock(ORDER_RUN_LOCK_PATH)
+
+templates = TemplateRegistry()
+templates.register("zoho", ZOHO_TEMPLATE_PATH, zoho_layout)
+templates.register("dpd", DPD_TEMPLATE_PATH, dpd_layout)
+templates.preload()
+
+supplier_registry = SupplierRegistry()
+for spec in SUPPLIERS:
+    supplier_registry.register(Supplier(**spec))
 
 def get_graph_access_token():
-    url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "scope": "https://graph.microsoft.com/.default"
-    }
-    r = requests.post(url, data=data)
-    r.raise_for_status()
-    return r.json()['access_token']
+    return token_provider.get_token()
 
 def download_excel_file(file_id):
-    token = get_graph_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{file_id}/content"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return pd.read_excel(BytesIO(r.content))
+    return load_parsed(DRIVE_ID, file_id, "xlsx", read_xlsx)[0]
 
 def download_supplier_csv():
-    token = get_graph_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{SUPPLIER_FILE_ID}/content"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return pd.read_csv(BytesIO(r.content))
+    return load_parsed(DRIVE_ID, SUPPLIER_FILE_ID, "csv", lambda content: pd.read_csv(BytesIO(content)))[0]
+
+def load_supplier_map():
+    """{Offer SKU: Supplier Name} from Supplier.csv, rebuilt only when the file changes. Read-only."""
+    supplier_df, tag = load_parsed(DRIVE_ID, SUPPLIER_FILE_ID, "csv", lambda content: pd.read_csv(BytesIO(content)))
+    return frame_memo.get_or_build(
+        (SUPPLIER_FILE_ID, tag, "sku_to_supplier"),
+        lambda: dict(zip(supplier_df['Offer SKU'], supplier_df['Supplier Name'])),
+    )
+
+def load_stock_sheet(file_id):
+    """Stock sheet DataFrame plus its read-only {Offer SKU: Quantity} map, both memoised by cTag."""
+    stock_df, tag = load_parsed(DRIVE_ID, file_id, "xlsx", read_xlsx)
+    stock_map = frame_memo.get_or_build(
+        (file_id, tag, "stock_map"),
+        lambda: stock_df.set_index('Offer SKU')['Quantity'].to_dict(),
+    )
+    return stock_df, stock_map
 
 def upload_excel_file(file_id, df):
-    token = get_graph_access_token()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    }
-    excel_buffer = BytesIO()
-    df.to_excel(excel_buffer, index=False)
-    excel_buffer.seek(0)
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{file_id}/content"
-    r = requests.put(url, headers=headers, data=excel_buffer.read())
+    headers = {"Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+    data = write_xlsx(df)
+    r = graph.put(f"/drives/{DRIVE_ID}/items/{file_id}/content", headers=headers, data=data)
     r.raise_for_status()
+    file_cache.store_upload(file_id, data, r)
 
-def get_dpd_template_columns(template_path):
-    with open(template_path, "r", encoding="utf-8") as f:
-        sample = f.read(2048)
-    delimiter = "," if sample.count(",") > sample.count(";") else ";"
-    df = pd.read_csv(template_path, header=None, delimiter=delimiter)
-    headers = list(df.iloc[1])
-    return df, headers, delimiter
+def update_stock_file(file_id, stock_df, previous_quantities):
+    """Push a stock sheet's new quantities to OneDrive, patching only changed cells when the layout allows."""
+    if STOCK_WRITE_MODE == "delta":
+        try:
+            if write_column_delta(DRIVE_ID, file_id, stock_df, previous_quantities, 'Quantity', 'Offer SKU'):
+                return "delta"
+        except Exception as e:
+            print(f"Delta write to {file_id} failed, uploading full file: {e}")
+    upload_excel_file(file_id, stock_df)
+    return "full"
 
 def load_sku_limits():
     try:
-        token = get_graph_access_token()
-        headers = {"Authorization": f"Bearer {token}"}
-        url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{SKU_MAX_FILE_ID}/content"
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        return json.loads(resp.content.decode())
+        return json.loads(file_cache.get_bytes(DRIVE_ID, SKU_MAX_FILE_ID).decode())
     except Exception as e:
         print(f"Error loading SKU max per parcel from OneDrive: {e}")
         return {}
 
 def save_sku_limits(limits):
     try:
-        token = get_graph_access_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = {"Content-Type": "application/json"}
         data = json.dumps(limits).encode("utf-8")
-        url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{SKU_MAX_FILE_ID}/content"
-        resp = requests.put(url, headers=headers, data=data)
+        resp = graph.put(f"/drives/{DRIVE_ID}/items/{SKU_MAX_FILE_ID}/content", headers=headers, data=data)
         resp.raise_for_status()
+        file_cache.store_upload(SKU_MAX_FILE_ID, data, resp)
         return True
     except Exception as e:
         print(f"Error saving SKU max per parcel to OneDrive: {e}")
         return False
 
 def get_previous_version_id(file_id):
-    token = get_graph_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{file_id}/versions"
-    resp = requests.get(url, headers=headers)
+    resp = graph.get(f"/drives/{DRIVE_ID}/items/{file_id}/versions")
     resp.raise_for_status()
     versions = resp.json().get("value", [])
     if len(versions) < 2:
@@ -115,55 +159,100 @@ def get_previous_version_id(file_id):
     return versions[1]['id']
 
 def restore_file_version(file_id, version_id):
-    token = get_graph_access_token()
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{file_id}/versions/{version_id}/restoreVersion"
-    resp = requests.post(url, headers=headers)
+    headers = {"Content-Type": "application/json"}
+    resp = graph.post(f"/drives/{DRIVE_ID}/items/{file_id}/versions/{version_id}/restoreVersion", headers=headers)
     resp.raise_for_status()
     return resp.ok
 
 # --- PO MAP HELPERS, 100% ONEDRIVE ---
 def upload_po_map(po_map):
-    token = get_graph_access_token()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    headers = {"Content-Type": "application/json"}
     data = json.dumps(po_map).encode("utf-8")
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{PO_MAP_FILE_ID}/content"
-    r = requests.put(url, headers=headers, data=data)
+    r = graph.put(f"/drives/{DRIVE_ID}/items/{PO_MAP_FILE_ID}/content", headers=headers, data=data)
     r.raise_for_status()
+    file_cache.store_upload(PO_MAP_FILE_ID, data, r)
 
 def download_po_map():
-    token = get_graph_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    url = f"https://graph.microsoft.com/v1.0/drives/{DRIVE_ID}/items/{PO_MAP_FILE_ID}/content"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return json.loads(r.content.decode())
+    return json.loads(file_cache.get_bytes(DRIVE_ID, PO_MAP_FILE_ID).decode())
 
-def save_po_map(po_number, batch_rows):
-    try:
-        po_map = download_po_map()
-    except Exception:
-        po_map = {}
-    po_map[po_number] = batch_rows
-    upload_po_map(po_map)
+po_store = PoMapStore(download_po_map, upload_po_map)
+po_index = PoIndex(po_store.load)
+po_store.listeners.append(po_index.add_entries)
+
+def generate_po_number(run_code, batch_idx):
+    # 8 characters: "PO" + 4 random (A-Z, 0-9) per run + 2 digit batch
+    return f"PO{run_code}{batch_idx+1:02d}"
+
+def new_po_run_code(batch_count):
+    """Random code for one run's PO numbers, redrawn while any of them is already known. Call under order_run_lock."""
+    known = set(po_store.pending())
+    while True:
+        run_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+        numbers = [generate_po_number(run_code, idx) for idx in range(batch_count)]
+        if not any(number in known or (po_index.loaded and po_index.has_po(number)) for number in numbers):
+            return run_code
+
+# --- INPUT PREFETCH ---
+class OrderInputs:
+    """Starts every independent OneDrive read for an upload at once and times each one."""
+
+    def __init__(self, fetchers):
+        self.timings = {}
+        self._started = time.perf_counter()
+        self._futures = {name: prefetch_pool.submit(self._timed, name, fn) for name, fn in fetchers.items()}
+
+    def _timed(self, name, fn):
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings[name] = time.perf_counter() - started
 
-def generate_po_number(batch_idx):
-    # 8 characters: "PO" + 4 random (A-Z, 0-9) + 2 digit batch
-    return f"PO{SESSION_UNIQUE}{batch_idx+1:02d}"
+    def result(self, name):
+        return self._futures[name].result()
+
+    def report(self):
+        wait(self._futures.values())
+        total = time.perf_counter() - self._started
+        parts = ", ".join(f"{name} {secs:.2f}s" for name, secs in self.timings.items())
+        print(f"Prefetch finished in {total:.2f}s ({parts})")
+        return total
+
+# Every OneDrive file an order run reads, by the name shown when one has changed since a run.
+ORDER_INPUT_FILES = {
+    "Supplier map": SUPPLIER_FILE_ID,
+    **{f"{supplier.name} stock": supplier.stock_file_id for supplier in supplier_registry.stocked()},
+    "SKU limits": SKU_MAX_FILE_ID,
+}
+
+def order_input_tags():
+    """Current OneDrive tag of each order input, fetched concurrently; None where it could not be read."""
+    futures = {
+        name: prefetch_pool.submit(file_cache.current_tag, DRIVE_ID, file_id)
+        for name, file_id in ORDER_INPUT_FILES.items()
+    }
+    tags = {}
+    for name, future in futures.items():
+        try:
+            tags[name] = future.result()
+        except Exception as e:
+            print(f"Could not read tag for {name}: {e}")
+            tags[name] = None
+    return tags
+
+def prefetch_order_inputs():
+    return OrderInputs({
+        "supplier_map": load_supplier_map,
+        **{f"{supplier.key}_stock": functools.partial(load_stock_sheet, supplier.stock_file_id)
+           for supplier in supplier_registry.stocked()},
+        "sku_limits": load_sku_limits,
+    })
 
 # ========== FASTAPI SETUP ==========
 app = FastAPI()
 app.add_middleware(SessionMiddleware, secret_key="!supersecret!")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-latest_nisbets_csv_batches = {}
-latest_zoho_xlsx = None
-latest_dpd_csv = None
-dpd_error_report_html = ""
-
 # ========== LOGIN ==========
 @app.get("/admin-login", response_class=HTMLResponse)
 async def login_form(request: Request):
@@ -198,11 +287,23 @@ async def login_submit(request: Request, password: str = Form(...)):
 async def admin_dashboard(request: Request):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
-    sku_limits = load_sku_limits()
+    sku_limits = await run_blocking(load_sku_limits)
     sku_list_html = "".join(
         f"<tr><td>{sku}</td><td>{max_per}</td></tr>"
         for sku, max_per in sku_limits.items()
     )
+    supplier_rows = []
+    for supplier in supplier_registry.stats()["suppliers"]:
+        runs = supplier["runs"]
+        per_run = (supplier["from_stock_lines"] + supplier["ordered_lines"]) / runs if runs else 0
+        last = supplier["last_run"] or {}
+        supplier_rows.append(
+            f"<tr><td>{supplier['name']}</td><td>{'yes' if supplier['stock_file_id'] else 'no'}</td>"
+            f"<td>{supplier['batch_size'] or 'all'}</td><td>{supplier['export']}</td><td>{runs}</td>"
+            f"<td>{per_run:.1f}</td><td>{last.get('from_stock_lines', 0)} / {last.get('ordered_lines', 0)}</td></tr>"
+        )
+    supplier_list_html = "".join(supplier_rows)
+    stocked_names = " & ".join(supplier.name for supplier in supplier_registry.stocked())
     return f"""
     <style>
     .admin-container {{
@@ -229,7 +330,7 @@ async def admin_dashboard(request: Request):
             <button type="submit">Delete</button>
         </form>
         <form method="post" action="/admin/undo-stock-update" style="margin-top:1em;">
-            <button type="submit">Undo Last Stock Update (Nisbets & Nortons)</button>
+            <button type="submit">Undo Last Stock Update ({stocked_names})</button>
         </form>
         <div style="margin-top:2em;">
             <a href="/admin/musgraves-dpd-upload">Musgraves DPD Upload Tool →</a>
@@ -241,6 +342,13 @@ async def admin_dashboard(request: Request):
                 {sku_list_html}
             </table>
         </div>
+        <div style="margin-top:2em;">
+            <h3>Suppliers</h3>
+            <table>
+                <tr><th>Supplier</th><th>Stock Sheet</th><th>Orders Per Batch</th><th>Export</th><th>Runs</th><th>Lines Per Run</th><th>Last Run (Stock / Ordered)</th></tr>
+                {supplier_list_html}
+            </table>
+        </div>
         <div style="margin-top:2em;">
             <form method="post" action="/logout">
                 <button type="submit">Logout</button>
@@ -256,21 +364,21 @@ async def admin_dashboard(request: Request):
 async def set_max_sku(request: Request, sku: str = Form(...), max_per_parcel: int = Form(...)):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
-    sku_limits = load_sku_limits()
+    sku_limits = await run_blocking(load_sku_limits)
     sku = sku.strip().upper()
     sku_limits[sku] = int(max_per_parcel)
-    save_sku_limits(sku_limits)
+    await run_blocking(save_sku_limits, sku_limits)
     return RedirectResponse("/admin", status_code=303)
 
 @app.post("/admin/delete-max-sku")
 async def delete_max_sku(request: Request, sku: str = Form(...)):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
-    sku_limits = load_sku_limits()
+    sku_limits = await run_blocking(load_sku_limits)
     sku = sku.strip().upper()
     if sku in sku_limits:
         del sku_limits[sku]
-        save_sku_limits(sku_limits)
+        await run_blocking(save_sku_limits, sku_limits)
     return RedirectResponse("/admin", status_code=303)
 
 @app.post("/logout")
@@ -283,13 +391,14 @@ async def undo_stock_update(request: Request):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
     results = []
-    for name, file_id in [("Nisbets", NISBETS_STOCK_FILE_ID), ("Nortons", NORTONS_STOCK_FILE_ID)]:
-        prev_version_id = get_previous_version_id(file_id)
+    for supplier in supplier_registry.stocked():
+        name, file_id = supplier.name, supplier.stock_file_id
+        prev_version_id = await run_blocking(get_previous_version_id, file_id)
         if not prev_version_id:
             results.append(f"<li>{name}: <span style='color:red'>No previous version available.</span></li>")
             continue
         try:
-            restore_file_version(file_id, prev_version_id)
+            await run_blocking(restore_file_version, file_id, prev_version_id)
             results.append(f"<li>{name}: <span style='color:green'>Stock file restored to previous version.</span></li>")
         except Exception as e:
             results.append(f"<li>{name}: <span style='color:red'>Restore failed: {e}</span></li>")
@@ -300,6 +409,62 @@ async def undo_stock_update(request: Request):
     """
     return HTMLResponse(html)
 
+@app.get("/admin/stats")
+async def admin_stats(request: Request):
+    if not request.session.get("admin_logged_in"):
+        return RedirectResponse("/admin-login", status_code=303)
+    return JSONResponse({
+        "graph_token": token_provider.stats(),
+        "file_cache": file_cache.stats(),
+        "frame_memo": frame_memo.stats(),
+        "snapshots": get_snapshot_store().stats(),
+        "po_map": await run_blocking(po_store.stats),
+        "po_index": po_index.stats(),
+        "artifacts": artifact_store.stats(),
+        "jobs": job_queue.stats(),
+        "uploads": upload_ledger.stats(),
+        "templates": templates.stats(),
+        "suppliers": supplier_registry.stats(),
+    })
+
+def benchmark_excel_layouts(order_bytes=None):
+    layouts = {
+        f"{supplier.key}_stock": file_cache.get_bytes(DRIVE_ID, supplier.stock_file_id)
+        for supplier in supplier_registry.stocked()
+    }
+    if order_bytes:
+        layouts["orders"] = order_bytes
+    return {
+        "selected_engine": select_engine(),
+        "layouts": {name: benchmark_engines(content) for name, content in layouts.items()},
+    }
+
+@app.get("/admin/excel-engines")
+async def excel_engines(request: Request):
+    """Parse time and parity of each installed Excel engine on the live stock sheets."""
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    return JSONResponse(await run_blocking(benchmark_excel_layouts))
+
+@app.post("/admin/excel-engines")
+async def excel_engines_with_orders(request: Request, file: UploadFile = File(...)):
+    """As GET, plus an uploaded order file."""
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    return JSONResponse(await run_blocking(benchmark_excel_layouts, await file.read()))
+
+@app.post("/admin/po-map/compact")
+async def compact_po_map(request: Request):
+    if not request.session.get("admin_logged_in"):
+        return RedirectResponse("/admin-login", status_code=303)
+    try:
+        synced = await run_blocking(po_store.compact)
+    except Exception as e:
+        pending = await run_blocking(po_store.pending)
+        return JSONResponse({"synced": 0, "error": str(e), "pending": len(pending)}, status_code=502)
+    pending = await run_blocking(po_store.pending)
+    return JSONResponse({"synced": synced, "pending": len(pending)})
+
 # ========== MAIN ORDER FILE UPLOAD & SPLIT ==========
 @app.get("/", response_class=HTMLResponse)
 async def main_upload_form(request: Request):
@@ -327,6 +492,7 @@ async def main_upload_form(request: Request):
       <h2>Upload Orders File</h2>
       <form class="upload-form" id="uploadForm" enctype="multipart/form-data">
         <input name="file" type="file" accept=".xlsx" required>
+        <label><input name="force" id="forceReprocess" type="checkbox" value="true"> Force reprocess (updates stock again even if this file was already processed)</label>
         <button type="submit">Upload & Show Output</button>
       </form>
       <div id="results"></div>
@@ -336,32 +502,173 @@ async def main_upload_form(request: Request):
     document.getElementById('uploadForm').onsubmit = async function(e){
       e.preventDefault();
       let formData = new FormData(this);
-      document.getElementById('results').innerHTML = "<em>Processing...</em>";
-      let res = await fetch('/upload_orders/display', { method: 'POST', body: formData });
-      let html = await res.text();
-      document.getElementById('results').innerHTML = html;
-      window.scrollTo(0,document.body.scrollHeight);
+      let results = document.getElementById('results');
+      results.innerHTML = "<em>Uploading...</em>";
+      let res = await fetch('/upload_orders/jobs', { method: 'POST', body: formData });
+      if (!res.ok) {
+        results.innerHTML = await res.text();
+        return;
+      }
+      let job = await res.json();
+      if (job.duplicate) {
+        let result = await fetch(job.result_url);
+        results.innerHTML = job.notice + await result.text();
+        window.scrollTo(0,document.body.scrollHeight);
+        return;
+      }
+      let events = new EventSource(job.events_url);
+      events.onmessage = async function(msg){
+        let state = JSON.parse(msg.data);
+        if (state.status === 'queued') {
+          results.innerHTML = "<em>Queued...</em>";
+        } else if (state.status === 'running') {
+          results.innerHTML = "<em>Processing: " + (state.stage || "starting") + "...</em>";
+        } else {
+          events.close();
+          let result = await fetch(job.result_url);
+          results.innerHTML = await result.text();
+          window.scrollTo(0,document.body.scrollHeight);
+        }
+      };
+      events.onerror = function(){
+        events.close();
+        results.innerHTML = "<b>Lost contact with the upload job.</b> <a href='" + job.result_url + "'>Check the result</a>";
+      };
     }
     </script>
     """
 
 @app.post("/upload_orders/display")
-async def upload_orders_display(request: Request, file: UploadFile = File(...)):
+async def upload_orders_display(request: Request, file: UploadFile = File(...), force: bool = Form(False)):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
-    global latest_nisbets_csv_batches, latest_zoho_xlsx, latest_dpd_csv, dpd_error_report_html
-    latest_nisbets_csv_batches = {}
+    job_id, previous = await submit_order_upload(await file.read(), force)
+    if previous is not None:
+        html = await run_blocking(artifact_store.get, job_id, "result.html")
+        notice = await duplicate_notice(previous)
+        return HTMLResponse(notice + (html.decode("utf-8") if html else ""))
+    job = job_queue.get(job_id)
+    return await asyncio.wrap_future(job.future)
+
+@app.post("/upload_orders/jobs")
+async def upload_orders_job(request: Request, file: UploadFile = File(...), force: bool = Form(False)):
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    job_id, previous = await submit_order_upload(await file.read(), force)
+    body = {
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "result_url": f"/jobs/{job_id}/result",
+    }
+    if previous is not None:
+        return JSONResponse({**body, "duplicate": True, "notice": await duplicate_notice(previous)})
+    return JSONResponse(body, status_code=202)
+
+async def submit_order_upload(content, force=False):
+    """Queue an order file unless the same bytes were already processed or are being processed.
+
+    Returns (job id, ledger entry of the earlier run or None). A file that is still being
+    processed joins the running job. force=True always queues a fresh run.
+    """
+    digest = upload_digest(content)
+    if not force:
+        previous = await run_blocking(upload_ledger.lookup, digest)
+        if previous is not None:
+            return previous["run_id"], previous
+    run_id = new_run_id()
+    active = upload_ledger.begin(digest, run_id)
+    if active is not None and not force and job_queue.get(active) is not None:
+        return active, None
+    job_queue.submit(run_id, run_order_job, content, digest=digest, force=force)
+    return run_id, None
+
+async def duplicate_notice(previous):
+    """Banner shown above a cached result, naming any inputs that changed since that run."""
+    current = await run_blocking(order_input_tags)
+    changed = [name for name, tag in previous["input_tags"].items() if tag is None or current.get(name) != tag]
+    processed_at = datetime.fromtimestamp(previous["processed_at"]).strftime("%d/%m/%Y %H:%M")
+    changed_text = (
+        f"<br>Changed since then: {', '.join(changed)}." if changed
+        else "<br>The supplier map, stock files and SKU limits are unchanged since then."
+    )
+    return f"""
+    <div class="out-card" style="background:#e8f1ff;border:1px solid #3b82f6;">
+      <h3>Already processed</h3>
+      This file was processed on {processed_at} (run {previous['run_id']}). Stock was <b>not</b> updated again;
+      the result below is from that run.{changed_text}
+      <br><button class="copy-btn" style="right:auto;top:auto;position:relative;margin-top:1em;" onclick="document.getElementById('forceReprocess').checked=true;document.getElementById('uploadForm').requestSubmit();">Process again anyway</button>
+    </div>
+    """
+
+def run_order_job(order_bytes, job, digest=None, force=False):
+    """Job body for an order upload; the result page is kept with the run's other artifacts.
+
+    A successful run is recorded in the upload ledger with the input tags it left behind.
+    """
+    input_tags = None
+    try:
+        response = process_order_upload(BytesIO(order_bytes), run_id=job.id, progress=job.progress,
+                                        digest=digest, reapply_stock=force)
+        artifact_store.put(job.id, "result.html", response.body)
+        job.info["status_code"] = response.status_code
+        if response.status_code == 200:
+            input_tags = order_input_tags()
+    finally:
+        if digest is not None:
+            upload_ledger.finish(digest, job.id, input_tags)
+    return response
+
+def save_job_state(job):
+    artifact_store.put(job.id, "job.json", json.dumps(job.to_dict()).encode("utf-8"))
+
+# Job state is written next to the run's artifacts so any worker can report on it.
+job_queue.listeners.append(save_job_state)
+
+async def load_job_state(job_id):
+    job = job_queue.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    data = await run_blocking(artifact_store.get, job_id, "job.json", cached=False)
+    return json.loads(data) if data else None
+
+def process_order_upload(order_file, run_id=None, progress=None, digest=None, reapply_stock=False):
+    """Runs the whole order pipeline on a worker thread and returns the result page.
+
+    progress, when given, is called with the name of each stage as it starts. With the
+    upload's digest, a successful stock write-back is recorded in the upload ledger at once,
+    and a later run of the same file skips the write-back unless reapply_stock. The run holds
+    order_run_lock throughout, so uploads overlapping in any worker wait here rather than
+    reading the same stock and overwriting each other's decrements and PO numbers.
+    """
+    stage = progress or (lambda name: None)
+    stage("Waiting for other uploads")
+    with order_run_lock:
+        return run_order_pipeline(order_file, run_id, stage, digest, reapply_stock)
+
+def run_order_pipeline(order_file, run_id, stage, digest=None, reapply_stock=False):
+    run_id = run_id or new_run_id()
+    artifact_store.start_run(run_id)
+    # Start all OneDrive reads now so they overlap each other and the order file parse.
+    inputs = prefetch_order_inputs()
 
+    stage("Reading order file")
     try:
-        df = pd.read_excel(file.file)
-        orders = df[['Order number', 'Offer SKU', 'Quantity']].dropna()
+        zoho_columns = templates.get("zoho")["columns"]
+        wanted_columns = list(dict.fromkeys(ORDER_LINE_COLUMNS + DPD_SOURCE_COLUMNS + zoho_columns))
+    except Exception:
+        # The Zoho stage reports the template problem; read everything until then.
+        wanted_columns = None
+    try:
+        df = read_orders(order_file, wanted_columns)
+        orders = compact_order_lines(df)
     except Exception as e:
         return HTMLResponse(f"<b>Order file read failed or missing columns:</b> {e}", status_code=500)
 
     # 2. Supplier Map
+    stage("Matching suppliers")
     try:
-        supplier_df = download_supplier_csv()
-        sku_to_supplier = dict(zip(supplier_df['Offer SKU'], supplier_df['Supplier Name']))
+        sku_to_supplier = inputs.result("supplier_map")
         orders['Supplier Name'] = orders['Offer SKU'].map(sku_to_supplier)
         unmatched = orders[orders['Supplier Name'].isna()][['Order number', 'Offer SKU', 'Quantity']]
         unmatched_report = []
@@ -371,70 +678,22 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
         return HTMLResponse(f"<b>Supplier fetch/mapping failed:</b> {e}", status_code=500)
 
     # 3. Stock
+    stage("Loading stock")
     try:
-        nisbets_stock = download_excel_file(NISBETS_STOCK_FILE_ID)
-        nortons_stock = download_excel_file(NORTONS_STOCK_FILE_ID)
-        stock_map = {
-            'Nisbets': nisbets_stock.set_index('Offer SKU')['Quantity'].to_dict(),
-            'Nortons': nortons_stock.set_index('Offer SKU')['Quantity'].to_dict(),
-        }
+        stock_sheets = {}
+        stock_maps = {}
+        for supplier in supplier_registry.stocked():
+            stock_sheets[supplier.name], stock_maps[supplier.name] = inputs.result(f"{supplier.key}_stock")
     except Exception as e:
         return HTMLResponse(f"<b>Stock file fetch failed:</b> {e}", status_code=500)
+    inputs.report()
 
-    stock_left = {k: stock_map[k].copy() for k in stock_map}
-    supplier_orders = {'Nortons': {}, 'Nisbets': {}}
-    stock_ship_orders = {}
-    nisbets_shipped = set()
-    nortons_shipped = set()
-
-    for _, row in orders.iterrows():
-        order_no = row['Order number']
-        sku = row['Offer SKU']
-        qty = int(row['Quantity'])
-        supplier = row['Supplier Name']
-        if supplier not in ['Nortons', 'Nisbets']:
-            continue
-        in_stock = stock_left[supplier].get(sku, 0)
-        from_stock = min(qty, in_stock)
-        to_supplier = qty - from_stock
-
-        if from_stock > 0:
-            if order_no not in stock_ship_orders:
-                stock_ship_orders[order_no] = []
-            stock_ship_orders[order_no].append((sku, from_stock))
-            stock_left[supplier][sku] = max(in_stock - from_stock, 0)
-            if supplier == 'Nisbets':
-                nisbets_shipped.add(sku)
-            else:
-                nortons_shipped.add(sku)
-        if to_supplier > 0:
-            if order_no not in supplier_orders[supplier]:
-                supplier_orders[supplier][order_no] = []
-            supplier_orders[supplier][order_no].append((sku, to_supplier))
-
-    # 4. Nisbets batch splitting
-    nisbets_orders = list(supplier_orders['Nisbets'].keys())
-    max_orders_per_file = 20
-    nisbets_batches = [
-        nisbets_orders[i:i+max_orders_per_file]
-        for i in range(0, len(nisbets_orders), max_orders_per_file)
-    ]
-    nisbets_csv_links = []
-    for idx, batch in enumerate(nisbets_batches):
-        batch_rows = []
-        for order in batch:
-            for sku, qty in supplier_orders['Nisbets'][order]:
-                batch_rows.append({'Order Number': order, 'Offer SKU': sku, 'Quantity': qty})
-        if batch_rows:
-            po_number = generate_po_number(idx)
-            df_batch = pd.DataFrame(batch_rows)
-            csv_buffer = StringIO()
-            df_batch.to_csv(csv_buffer, index=False)
-            csv_bytes = csv_buffer.getvalue().encode('utf-8')
-            latest_nisbets_csv_batches[po_number] = csv_bytes
-            save_po_map(po_number, batch_rows)
-            link = f"<a href='/download_nisbets_csv/{po_number}' download='{po_number}.csv'><button class='copy-btn' style='right:auto;top:auto;position:relative;margin-bottom:1em;'>Download Nisbets CSV {po_number}</button></a>"
-            nisbets_csv_links.append(link)
+    stage("Allocating orders")
+    allocation = allocate_orders(orders, supplier_registry.compile(sku_to_supplier, stock_maps))
+    supplier_registry.record_run(allocation)
+    stock_ship_orders = allocation.stock_lines()
+    stock_left = allocation.remaining_by_name()
+    unregistered = orders[orders['Supplier Name'].notna() & ~orders['Supplier Name'].isin(supplier_registry.names())]
 
     def format_order_block(order_dict, title):
         out = []
@@ -445,92 +704,119 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
             out.append("\n------------------------------\n\n")
         return "".join(out) if out else f"No {title.lower()}."
 
-    nortons_out = format_order_block(supplier_orders['Nortons'], "Nortons orders")
-    nisbets_batch_blocks = []
-    for idx, batch in enumerate(nisbets_batches):
-        batch_orders = {order: supplier_orders['Nisbets'][order] for order in batch}
-        orders_text = format_order_block(batch_orders, f"Nisbets orders (Batch {idx+1})")
-        download_btn = nisbets_csv_links[idx]
-        nisbets_batch_blocks.append(f"""
+    def order_card(title, element_id, orders_text, download_btn=""):
+        return f"""
         <div class="out-card">
-          <h3>Nisbets Orders – Batch {idx+1}</h3>
+          <h3>{title}</h3>
           {download_btn}
-          <button class="copy-btn" onclick="navigator.clipboard.writeText(document.getElementById('nisbetsout_{idx}').innerText)">Copy</button>
-          <pre id="nisbetsout_{idx}">{orders_text}</pre>
+          <button class="copy-btn" onclick="navigator.clipboard.writeText(document.getElementById('{element_id}').innerText)">Copy</button>
+          <pre id="{element_id}">{orders_text}</pre>
         </div>
-        """)
-    nisbets_out = "\n".join(nisbets_batch_blocks)
+        """
+
+    # 4. Supplier orders, split into batches (and PO files) as each supplier is set up
+    stage("Building supplier orders")
+    suppliers = supplier_registry.suppliers()
+    batches = assign_batches(allocation.supplier_orders, {supplier.name: supplier.batch_size for supplier in suppliers})
+    batch_orders_by_id = batch_lines(batches)
+    batch_ids = {}
+    for batch, (supplier_name, _) in batch_orders_by_id.items():
+        batch_ids.setdefault(supplier_name, []).append(batch)
+    po_suppliers = {supplier.name for supplier in suppliers if supplier.export == "po_csv"}
+    po_csvs = render_batch_csvs(batches[batches['Supplier Name'].isin(po_suppliers)], render_pool)
+    run_code = new_po_run_code(len(po_csvs))
+    po_numbers = {batch: generate_po_number(run_code, idx) for idx, batch in enumerate(po_csvs)}
+    po_entries = {}
+    for batch, csv_bytes in po_csvs.items():
+        artifact_store.put(run_id, f"{po_numbers[batch]}.csv", csv_bytes)
+        po_entries[po_numbers[batch]] = [
+            {'Order Number': order_no, 'Offer SKU': sku, 'Quantity': qty}
+            for order_no, lines in batch_orders_by_id[batch][1].items()
+            for sku, qty in lines
+        ]
+    # One log append and one OneDrive write for every PO in this run.
+    po_store.commit(po_entries)
+    if po_csvs:
+        artifact_store.put(run_id, "PO_CSVs.zip", zip_files({f"{po}.csv": po_csvs[batch] for batch, po in po_numbers.items()}))
+        po_zip_link = f"<a href='/download_po_zip?run={run_id}' download='PO_CSVs.zip'><button class='copy-btn' style='right:auto;top:auto;position:relative;margin-bottom:1em;margin-left:1em;'>Download All PO CSVs (zip)</button></a><br>"
+    else:
+        po_zip_link = ""
+
+    supplier_blocks = []
+    for supplier in suppliers:
+        if supplier.batch_size is None and supplier.name not in batch_ids:
+            supplier_blocks.append(order_card(
+                f"{supplier.name} (Order from Supplier)", f"{supplier.key}out",
+                format_order_block({}, f"{supplier.name} orders"),
+            ))
+        for idx, batch in enumerate(batch_ids.get(supplier.name, [])):
+            batch_orders = batch_orders_by_id[batch][1]
+            download_btn = ""
+            if batch in po_numbers:
+                po_number = po_numbers[batch]
+                download_btn = f"<a href='/download_po_csv/{po_number}?run={run_id}' download='{po_number}.csv'><button class='copy-btn' style='right:auto;top:auto;position:relative;margin-bottom:1em;'>Download {supplier.name} CSV {po_number}</button></a>"
+            if supplier.batch_size is None:
+                title, element_id = f"{supplier.name} (Order from Supplier)", f"{supplier.key}out"
+                orders_text = format_order_block(batch_orders, f"{supplier.name} orders")
+            else:
+                title, element_id = f"{supplier.name} Orders – Batch {idx+1}", f"{supplier.key}out_{idx}"
+                orders_text = format_order_block(batch_orders, f"{supplier.name} orders (Batch {idx+1})")
+            supplier_blocks.append(order_card(title, element_id, orders_text, download_btn))
+    supplier_out = "\n".join(supplier_blocks)
     stock_out = format_order_block(stock_ship_orders, "stock shipments")
 
     # 6. Zoho XLSX Generation
+    stage("Building Zoho export")
     try:
-        template_df = pd.read_excel(ZOHO_TEMPLATE_PATH)
-        zoho_col_order = list(template_df.columns)
+        zoho_col_order = templates.get("zoho")["columns"]
     except Exception as e:
         return HTMLResponse(
             f"<b>Failed to load Zoho template: {e}</b>",
             status_code=500
         )
-    zoho_df = df.copy()
-    if 'Date created' in zoho_df.columns:
-        zoho_df['Date created'] = zoho_df['Date created'].astype(str).str.split().str[0]
-    zoho_df['Shipping total amount'] = 4.95
-    zoho_df['Currency Code'] = 'EUR'
-    zoho_df['Account'] = 'Caterboss Sales'
-    zoho_df['item Tax'] = 'VAT'
-    zoho_df['IteM Tax %'] = 23
-    zoho_df['Trade'] = 'No'
-    zoho_df['Channel'] = 'Caterboss'
-    zoho_df['Branch'] = 'Head Office'
-    zoho_df['Shipping Tax Name'] = 'VAT'
-    zoho_df['Shipping Tax percentage'] = 23
-    zoho_df['LCS'] = 'false'
-    zoho_df['Sales Person'] = 'Musgraves Tonka'
-    zoho_df['Terms'] = '60'
-    zoho_df['Sales Order Number'] = 'MUSGRAVE'
-    if 'Order number' in zoho_df.columns:
-        zoho_df['Invoice Number'] = zoho_df['Order number']
-        zoho_df['Subject'] = zoho_df['Order number']
-    zoho_df['Payment Terms'] = 'Musgrave'
-    for col in zoho_col_order:
-        if col not in zoho_df.columns:
-            zoho_df[col] = ""
-    zoho_df = zoho_df[zoho_col_order]
-    zoho_df = zoho_df.sort_values("Order number").reset_index(drop=True)
-    buffer = BytesIO()
-    zoho_df.to_excel(buffer, index=False)
-    buffer.seek(0)
-    latest_zoho_xlsx = buffer.getvalue()
-    zoho_download_link = "<a href='/download_zoho_xlsx' download='zoho_orders.xlsx'><button class='copy-btn' style='background:#0f9d58;right:auto;top:auto;position:relative;margin-bottom:1em;margin-left:1em;'>Download Zoho XLSX</button></a>"
+    zoho_df = build_zoho_export(df, zoho_col_order)
+    artifact_store.put(run_id, "zoho_orders.xlsx", write_xlsx(zoho_df))
+    zoho_download_link = f"<a href='/download_zoho_xlsx?run={run_id}' download='zoho_orders.xlsx'><button class='copy-btn' style='background:#0f9d58;right:auto;top:auto;position:relative;margin-bottom:1em;margin-left:1em;'>Download Zoho XLSX</button></a>"
 
     # 7. Stock file updates
-    for sku in nisbets_shipped:
-        if sku in nisbets_stock['Offer SKU'].values:
-            idx = nisbets_stock[nisbets_stock['Offer SKU'] == sku].index[0]
-            nisbets_stock.at[idx, 'Quantity'] = max(stock_left['Nisbets'].get(sku, 0), 0)
-    for sku in nortons_shipped:
-        if sku in nortons_stock['Offer SKU'].values:
-            idx = nortons_stock[nortons_stock['Offer SKU'] == sku].index[0]
-            nortons_stock.at[idx, 'Quantity'] = max(stock_left['Nortons'].get(sku, 0), 0)
-    try:
-        if nisbets_shipped:
-            upload_excel_file(NISBETS_STOCK_FILE_ID, nisbets_stock)
-        if nortons_shipped:
-            upload_excel_file(NORTONS_STOCK_FILE_ID, nortons_stock)
-    except Exception as e:
-        if "423" in str(e):
-            return HTMLResponse("<b>Stock file update failed: File is open or locked in Excel.<br>Please close the file everywhere and try again in a minute.</b>", status_code=423)
-        return HTMLResponse(f"<b>Stock file update failed:</b> {e}", status_code=500)
+    stage("Updating stock files")
+    applied = None if digest is None or reapply_stock else upload_ledger.stock_applied(digest)
+    if applied is not None:
+        # An earlier run of this file wrote its stock back, then failed; don't decrement it twice.
+        stock_notice = f"""
+    <div class="out-card" style="background:#fff4e5;border:1px solid #ffc107;">
+      <h3>Stock already updated</h3>
+      Run {applied['run_id']} already wrote this file's stock back before it failed, so stock was <b>not</b> updated again.
+      Stock shipments below were worked out against the already updated stock.
+    </div>
+    """
+    else:
+        stock_notice = ""
+        quantities_before = {}
+        for supplier in supplier_registry.stocked():
+            quantities_before[supplier.name] = stock_sheets[supplier.name]['Quantity'].copy()
+            apply_remaining_stock(stock_sheets[supplier.name], stock_left.get(supplier.name, {}))
+        try:
+            for supplier in supplier_registry.stocked():
+                if stock_left.get(supplier.name):
+                    update_stock_file(supplier.stock_file_id, stock_sheets[supplier.name], quantities_before[supplier.name])
+        except Exception as e:
+            if "423" in str(e):
+                return HTMLResponse("<b>Stock file update failed: File is open or locked in Excel.<br>Please close the file everywhere and try again in a minute.</b>", status_code=423)
+            return HTMLResponse(f"<b>Stock file update failed:</b> {e}", status_code=500)
+        if digest is not None:
+            upload_ledger.mark_stock_applied(digest, run_id)
 
     # --- 8. DPD CSV Generation ---
+    stage("Building DPD export")
     try:
-        dpd_template_df, dpd_col_headers, dpd_delim = get_dpd_template_columns(DPD_TEMPLATE_PATH)
-        dpd_col_count = len(dpd_col_headers)
+        dpd_template = templates.get("dpd")
+        dpd_col_count = dpd_template["column_count"]
+        dpd_delim = dpd_template["delimiter"]
     except Exception as e:
-        dpd_col_headers, latest_dpd_csv = [], None
         dpd_error_report_html = f"<b>Failed to load DPD template: {e}</b>"
         dpd_download_link = "<span style='color:#e87272;'>DPD template not loaded.</span>"
-        html = f"""<div style='color:red;padding:1em'>{dpd_error_report_html}</div>"""
+        html = f"""{stock_notice}<div style='color:red;padding:1em'>{dpd_error_report_html}</div>"""
         # --- UNMATCHED REPORT ADDED HERE ---
         if unmatched_report:
             report_html = """
@@ -552,109 +838,17 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
             html += report_html
         return HTMLResponse(html)
 
-    sku_limits = load_sku_limits()
+    sku_limits = inputs.result("sku_limits")
     exclude_orders = set(['X001111531-A', 'X001111392-A', 'X001111558-A', 'X001111425-A'])
     exclude_orders.update([x.replace('-A', '-B') for x in exclude_orders])
-    orders_df = df.copy()
+    orders_df = df[[col for col in DPD_SOURCE_COLUMNS if col in df.columns]]
     orders_df = orders_df[orders_df['Order number'].astype(str).str.endswith(('-A', '-B'))]
     orders_df = orders_df[~orders_df['Order number'].isin(exclude_orders)].copy()
     orders_df['base_order'] = orders_df['Order number'].str.replace(r'(-A|-B)$', '', regex=True)
     orders_df['order_suffix'] = orders_df['Order number'].str.extract(r'-(A|B)$')
-    final_order_rows = []
-    used_orders = set()
-    
-    import math
-
-    final_order_rows = []
-    used_base_orders = set()
-
-    grouped = orders_df.groupby('base_order')
-    for base, group in grouped:
-        special_label_count = 0
-        has_special = False
-        has_other = False
-        for _, r in group.iterrows():
-            sku = str(r.get('Offer SKU', '')).strip().upper()
-            qty = int(r.get('Quantity', 1))
-            max_per = sku_limits.get(sku)
-            if max_per is not None:
-                has_special = True
-                special_label_count += math.ceil(qty / int(max_per))
-            else:
-                has_other = True
-
-        if has_special:
-            total_labels = special_label_count
-            if has_other:
-                total_labels += 1  # One extra label for all non-special SKUs, if any
-            if total_labels == 0:
-                total_labels = 1  # Failsafe: never zero labels
-        else:
-            total_labels = 2 if len(group) > 1 else 1
-
-        # Output only the A row (if exists), otherwise B
-        if 'A' in group['order_suffix'].values:
-            row = group[group['order_suffix'] == 'A'].iloc[0].copy()
-            row['dpd_parcel_count'] = total_labels
-            final_order_rows.append(row)
-            used_base_orders.add(base)
-        elif 'B' in group['order_suffix'].values:
-            row = group[group['order_suffix'] == 'B'].iloc[0].copy()
-            row['dpd_parcel_count'] = total_labels
-            final_order_rows.append(row)
-            used_base_orders.add(base)
-
-
-
-
-    dpd_final_df = pd.DataFrame(final_order_rows).drop_duplicates('Order number')
-    dpd_final_df = dpd_final_df.sort_values("Order number").reset_index(drop=True)
-
-    dpd_field_map = {
-        0:  lambda row: row.get('Order number', ''),
-        1:  lambda row: row.get('Shipping address company', ''),
-        2:  lambda row: row.get('Shipping address company', ''),
-        3:  lambda row: row.get('Shipping address street 1', ''),
-        4:  lambda row: row.get('Shipping address street 2', ''),
-        5:  lambda row: row.get('Shipping address city', ''),
-        6:  lambda row: row.get('Shipping address state', ''),
-        7:  lambda row: row.get('Shipping address zip', ''),
-        8:  lambda row: '372',
-        9:  lambda row: str(row.get('dpd_parcel_count', 1)),
-        10: lambda row: '1',
-        11: lambda row: 'N',
-        12: lambda row: 'O',
-        23: lambda row: row.get('Shipping address first name', ''),
-        24: lambda row: row.get('Shipping address phone', ''),
-        28: lambda row: '8130L3',
-        30: lambda row: 'N',
-        31: lambda row: 'N',
-    }
-    required_fields = [
-        (0, 'Order number'),
-        (1, 'Shipping address company'),
-        (3, 'Shipping address street 1'),
-        (5, 'Shipping address city'),
-        (7, 'Shipping address zip'),
-        (23, 'Shipping address first name'),
-        (24, 'Shipping address phone'),
-    ]
-    export_rows = []
-    errors = []
-    for _, row in dpd_final_df.iterrows():
-        row_data = [''] * dpd_col_count
-        missing = []
-        for idx, fname in required_fields:
-            value = dpd_field_map[idx](row)
-            if not value or pd.isnull(value) or str(value).strip() == '':
-                missing.append(fname)
-        if missing:
-            errors.append({'Order number': row.get('Order number', ''), 'Missing': ', '.join(missing)})
-            continue
-        for i in range(dpd_col_count):
-            if i in dpd_field_map:
-                row_data[i] = dpd_field_map[i](row)
-        export_rows.append(row_data)
+    dpd_final_df = dpd_parcel_rows(orders_df, sku_limits)
+
+    dpd_csv, errors = build_dpd_export(dpd_final_df, dpd_col_count, dpd_delim)
     if errors:
         dpd_error_report_html = "<div class='out-card' style='background:#ffefef;border:1px solid #e87272;'><h3>DPD Label Export: Excluded Orders</h3><table style='width:100%;border-collapse:collapse;'><tr><th>Order Number</th><th>Missing Field(s)</th></tr>"
         for e in errors:
@@ -662,15 +856,13 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
         dpd_error_report_html += "</table></div>"
     else:
         dpd_error_report_html = ""
-    if export_rows:
-        dpd_buffer = StringIO()
-        pd.DataFrame(export_rows).to_csv(dpd_buffer, header=False, index=False, sep=dpd_delim)
-        latest_dpd_csv = dpd_buffer.getvalue().encode('utf-8')
-        dpd_download_link = "<a href='/download_dpd_csv' download='DPD_Export.csv'><button class='copy-btn' style='background:#ff9900;right:auto;top:auto;position:relative;margin-bottom:1em;margin-left:1em;'>Download DPD CSV</button></a>"
+    if dpd_csv is not None:
+        artifact_store.put(run_id, "DPD_Export.csv", dpd_csv.encode('utf-8'))
+        dpd_download_link = f"<a href='/download_dpd_csv?run={run_id}' download='DPD_Export.csv'><button class='copy-btn' style='background:#ff9900;right:auto;top:auto;position:relative;margin-bottom:1em;margin-left:1em;'>Download DPD CSV</button></a>"
     else:
-        latest_dpd_csv = None
         dpd_download_link = "<span style='color:#e87272;'>No valid DPD export labels generated for this file.</span>"
 
+    stage("Rendering results")
     html = f"""
     <style>
     .out-card {{ background:#f7fafc; border-radius:10px; margin:1.5em 0; padding:1.3em 1.5em; box-shadow:0 2px 8px #0001; position:relative;}}
@@ -679,13 +871,8 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
     h3 {{ margin-top:0; }}
     pre {{ white-space: pre-wrap; font-family:inherit; font-size:1.09em; margin:0;}}
     </style>
-    <div class="out-card">
-      <h3>Nortons (Order from Supplier)</h3>
-      <button class="copy-btn" onclick="navigator.clipboard.writeText(document.getElementById('nortonsout').innerText)">Copy</button>
-      <pre id="nortonsout">{nortons_out}</pre>
-    </div>
-    
-{nisbets_out}
+{stock_notice}
+{supplier_out}
 
     <div class="out-card">
       <h3>Ship from Stock</h3>
@@ -693,7 +880,7 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
       <pre id="stockout">{stock_out}</pre>
     </div>
     <div style='margin-top:2em;text-align:center;'>
-        {zoho_download_link}<br>{dpd_download_link}
+        {po_zip_link}{zoho_download_link}<br>{dpd_download_link}
     </div>
     {dpd_error_report_html}
     """
@@ -718,36 +905,129 @@ async def upload_orders_display(request: Request, file: UploadFile = File(...)):
         """
         html += report_html
 
+    # Lines whose supplier in Supplier.csv is not registered are not allocated or ordered.
+    if not unregistered.empty:
+        report_html = """
+        <div class="out-card" style="background:#fff4e5;border:1px solid #ffc107;">
+          <h3>⚠️ Suppliers Not Set Up</h3>
+          <table style="width:100%;border-collapse:collapse;">
+            <tr><th>Supplier</th><th>Order Number</th><th>Offer SKU</th><th>Quantity</th></tr>"""
+        for supplier, order_no, sku, qty in zip(unregistered['Supplier Name'].tolist(), unregistered['Order number'].tolist(),
+                                                unregistered['Offer SKU'].tolist(), unregistered['Quantity'].tolist()):
+            report_html += f"""
+            <tr>
+              <td>{supplier}</td>
+              <td>{order_no}</td>
+              <td>{sku}</td>
+              <td>{qty}</td>
+            </tr>"""
+        report_html += """
+          </table>
+        </div>
+        """
+        html += report_html
+
     return HTMLResponse(html)
 
+# ========== JOB STATUS ROUTES ==========
+JOB_EVENT_INTERVAL = float(os.getenv("JOB_EVENT_INTERVAL", "0.5"))
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    state = await load_job_state(job_id)
+    if state is None:
+        return JSONResponse({"error": f"Unknown job {job_id}"}, status_code=404)
+    return JSONResponse(state)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-sent events: the job state each time it changes, ending once the job has finished."""
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+
+    async def stream():
+        last_version = None
+        while True:
+            state = await load_job_state(job_id)
+            if state is None:
+                yield f"event: error\ndata: {json.dumps({'error': f'Unknown job {job_id}'})}\n\n"
+                return
+            if state["version"] != last_version:
+                last_version = state["version"]
+                yield f"data: {json.dumps(state)}\n\n"
+            if state["status"] in ("done", "failed") or await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(request: Request, job_id: str):
+    if not request.session.get("admin_logged_in"):
+        return RedirectResponse("/admin-login", status_code=303)
+    state = await load_job_state(job_id)
+    if state is None:
+        return HTMLResponse(f"<b>Unknown upload job {job_id}.</b>", status_code=404)
+    if state["status"] == "failed":
+        return HTMLResponse(f"<b>Order processing failed:</b> {state['error']}", status_code=500)
+    if state["status"] != "done":
+        return JSONResponse(state, status_code=202)
+    html = await run_blocking(artifact_store.get, job_id, "result.html")
+    if html is None:
+        return HTMLResponse(f"<b>The result for job {job_id} has expired.</b>", status_code=404)
+    return HTMLResponse(html, status_code=state.get("status_code", 200))
+
 # ========== FILE DOWNLOAD ROUTES ==========
-@app.get("/download_nisbets_csv/{po_number}")
-async def download_nisbets_csv(po_number: str):
-    csv_bytes = latest_nisbets_csv_batches.get(po_number)
+async def load_artifact(run, name):
+    """Artifact bytes for a run id, or for the most recent run when no id is given."""
+    run_id = run or artifact_store.latest_run()
+    if not run_id:
+        return None
+    return await run_blocking(artifact_store.get, run_id, name)
+
+@app.get("/download_po_csv/{po_number}")
+@app.get("/download_nisbets_csv/{po_number}")  # links on result pages from before suppliers were configurable
+async def download_po_csv(po_number: str, run: str = None):
+    csv_bytes = await load_artifact(run, f"{po_number}.csv")
     if not csv_bytes:
-        return HTMLResponse(f"<b>No Nisbets CSV batch {po_number} generated in this session yet.</b>", status_code=404)
+        return HTMLResponse(f"<b>No PO CSV batch {po_number} generated in this session yet.</b>", status_code=404)
     return StreamingResponse(
         BytesIO(csv_bytes),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={po_number}.csv"}
     )
 
+@app.get("/download_po_zip")
+async def download_po_zip(run: str = None):
+    zip_bytes = await load_artifact(run, "PO_CSVs.zip")
+    if not zip_bytes:
+        return HTMLResponse("<b>No PO CSVs generated in this session yet.</b>", status_code=404)
+    return StreamingResponse(
+        BytesIO(zip_bytes),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=PO_CSVs.zip"}
+    )
+
 @app.get("/download_zoho_xlsx")
-async def download_zoho_xlsx():
-    if not latest_zoho_xlsx:
+async def download_zoho_xlsx(run: str = None):
+    zoho_xlsx = await load_artifact(run, "zoho_orders.xlsx")
+    if not zoho_xlsx:
         return HTMLResponse("<b>No Zoho XLSX generated in this session yet.</b>", status_code=404)
     return StreamingResponse(
-        BytesIO(latest_zoho_xlsx),
+        BytesIO(zoho_xlsx),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": "attachment; filename=zoho_orders.xlsx"}
     )
 
 @app.get("/download_dpd_csv")
-async def download_dpd_csv():
-    if not latest_dpd_csv:
+async def download_dpd_csv(run: str = None):
+    dpd_csv = await load_artifact(run, "DPD_Export.csv")
+    if not dpd_csv:
         return HTMLResponse("<b>No DPD CSV generated in this session yet.</b>", status_code=404)
     return StreamingResponse(
-        BytesIO(latest_dpd_csv),
+        BytesIO(dpd_csv),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=DPD_Export.csv"}
     )
@@ -780,8 +1060,11 @@ async def musgraves_dpd_form(request: Request):
 async def musgraves_dpd_upload(request: Request, file: UploadFile = File(...)):
     if not request.session.get("admin_logged_in"):
         return RedirectResponse("/admin-login", status_code=303)
+    return await run_blocking(process_musgraves_dpd_file, file.file)
+
+def process_musgraves_dpd_file(dpd_file):
     try:
-        df = pd.read_csv(file.file)
+        df = pd.read_csv(dpd_file)
         required_cols = ['DPD Customers First Ref', 'DPD Consignment number', 'cURL']
         missing = [col for col in required_cols if col not in df.columns]
         if missing:
@@ -834,13 +1117,13 @@ async def po_lookup_post(request: Request, po_number: str = Form(...), sku: str
     sku = sku.strip().upper()
     po_number = po_number.strip()
     try:
-        po_map = download_po_map()
+        if not po_index.loaded:
+            await run_blocking(po_index.refresh)
     except Exception:
         return HTMLResponse("<b>No PO map log found or failed to load from OneDrive.</b>")
-    batch = po_map.get(po_number)
-    if not batch:
+    if not po_index.has_po(po_number):
         return HTMLResponse(f"<b>No batch found for PO number: {po_number}</b>")
-    orders = [row["Order Number"] for row in batch if row["Offer SKU"].strip().upper() == sku]
+    orders = [str(order) for order in po_index.orders_for(po_number, sku)]
     if not orders:
         result = f"No order found for SKU <b>{sku}</b> in PO <b>{po_number}</b>."
     else:
@@ -859,4 +1142,37 @@ async def po_lookup_post(request: Request, po_number: str = Form(...), sku: str
     </div>
     """
 
+@app.get("/admin/lookup.json")
+async def po_lookup_json(request: Request, po_number: str = "", sku: str = "", order_number: str = ""):
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    if not po_index.loaded:
+        try:
+            await run_blocking(po_index.refresh)
+        except Exception as e:
+            return JSONResponse({"error": f"PO map failed to load from OneDrive: {e}"}, status_code=502)
+    result = {}
+    if po_number and sku:
+        result["orders"] = po_index.orders_for(po_number, sku)
+    elif sku:
+        result["pos"] = po_index.pos_for_sku(sku)
+    if order_number:
+        result["order_pos"] = po_index.pos_for_order(order_number)
+    return JSONResponse({"po_number": po_number, "sku": sku, "order_number": order_number, **result})
+
+@app.post("/admin/lookup/bulk")
+async def po_lookup_bulk(request: Request):
+    if not request.session.get("admin_logged_in"):
+        return JSONResponse({"error": "Not logged in"}, status_code=401)
+    payload = await request.json()
+    skus = payload.get("skus") or []
+    if not isinstance(skus, list):
+        return JSONResponse({"error": "skus must be a list"}, status_code=400)
+    if not po_index.loaded:
+        try:
+            await run_blocking(po_index.refresh)
+        except Exception as e:
+            return JSONResponse({"error": f"PO map failed to load from OneDrive: {e}"}, status_code=502)
+    return JSONResponse(po_index.bulk_lookup(skus, payload.get("po_number") or None))
+
 # END main.py
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
 import requests
 from io import BytesIO
+from graph_files import upsert_stock
 
 # === CONFIG ===
 TENANT_ID = "ce280aae-ee92-41fe-ab60-66b37ebc97dd"
@@ -81,17 +82,7 @@ def upload_csv_to_onedrive(drive_id: str, path: str, content: bytes) -> str:
     return resp.json().get("id")
 
 def upload_stock_update(stock_df: pd.DataFrame, items: dict) -> pd.DataFrame:
-    updated_rows = 0
-    for sku, quantity in items.items():
-        match = stock_df[stock_df["Offer SKU"].astype(str).str.strip() == str(sku).strip()]
-        if not match.empty:
-            stock_df.loc[match.index, "Quantity"] = quantity
-            updated_rows += 1
-        else:
-            new_row = pd.DataFrame({"Offer SKU": [sku], "Quantity": [quantity]})
-            stock_df = pd.concat([stock_df, new_row], ignore_index=True)
-            updated_rows += 1
-    return stock_df
+    return upsert_stock(stock_df, items, sku_col="Offer SKU", qty_col="Quantity")[0]
 
 @app.post("/update-stock/")
 async def update_stock(supplier_name: str, items: dict):
@@ -0,0 +1,87 @@
+# order_reader.py
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+from excel_reader import read_xlsx, select_engine
+
+# Columns the allocation stage works on.
+ORDER_LINE_COLUMNS = ['Order number', 'Offer SKU', 'Quantity']
+
+# Values openpyxl returns for error cells when reading values only; pandas reads them as NaN.
+_EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+
+
+def _convert(value):
+    if value is None:
+        return ""
+    if type(value) is float:
+        whole = int(value)
+        return whole if whole == value else value
+    if type(value) is str and value in _EXCEL_ERRORS:
+        return np.nan
+    return value
+
+
+def read_orders(source, columns=None) -> pd.DataFrame:
+    """Read the first sheet of an orders workbook, keeping only the named columns.
+
+    With a faster engine than openpyxl installed this is read_xlsx. Otherwise rows are
+    streamed with openpyxl's read-only reader and cells outside the wanted columns are never
+    converted; cell conversion and type inference follow pd.read_excel, so the columns come
+    back with the same values and dtypes either way. columns=None keeps every column; wanted
+    columns missing from the sheet are simply absent from the result.
+    """
+    if select_engine() != "openpyxl":
+        return read_xlsx(source, columns)
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        header = [_convert(name) for name in header]
+        if columns is None:
+            picks = list(range(len(header)))
+        else:
+            wanted = set(columns)
+            picks = []
+            for pos, name in enumerate(header):
+                if name in wanted:
+                    picks.append(pos)
+                    wanted.discard(name)
+        width = len(picks)
+        data = [[header[pos] for pos in picks]]
+        last_with_data = 0
+        for row in rows:
+            size = len(row)
+            converted = [_convert(row[pos]) if pos < size else "" for pos in picks]
+            # Trailing blank rows are trimmed as pd.read_excel does: by the whole row, so a row
+            # with data only in unwanted columns is kept (blank in the wanted ones).
+            if any(value != "" for value in converted) or any(cell is not None and cell != "" for cell in row):
+                last_with_data = len(data)
+            data.append(converted)
+    finally:
+        workbook.close()
+    del data[last_with_data + 1:]
+    if width == 0:
+        return pd.DataFrame()
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def compact_order_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """Complete order lines with categorical order number and SKU and the smallest integer quantity dtype.
+
+    Quantities that are not all whole numbers are left as they are.
+    """
+    lines = df[ORDER_LINE_COLUMNS].dropna()
+    quantity = lines['Quantity']
+    if pd.api.types.is_numeric_dtype(quantity) and (quantity == np.floor(quantity)).all():
+        quantity = pd.to_numeric(quantity.astype(np.int64), downcast='integer')
+    return lines.assign(**{
+        'Order number': lines['Order number'].astype('category'),
+        'Offer SKU': lines['Offer SKU'].astype('category'),
+        'Quantity': quantity,
+    })
@@ -0,0 +1,110 @@
+# po_batches.py
+import os
+import zipfile
+from io import BytesIO
+import numpy as np
+import pandas as pd
+
+# Columns of a PO batch CSV (and of each line recorded in the PO map).
+PO_CSV_COLUMNS = ['Order Number', 'Offer SKU', 'Quantity']
+# Large runs render their PO CSVs on the render pool, in chunks of this many lines.
+PARALLEL_RENDER_MIN_ROWS = int(os.getenv("PARALLEL_RENDER_MIN_ROWS", "20000"))
+
+
+def assign_batches(supplier_orders: pd.DataFrame, batch_sizes: dict) -> pd.DataFrame:
+    """Every supplier order line with its batch, sorted into batch order, in one pass over the table.
+
+    supplier_orders has Order number, Offer SKU, Supplier Name and Quantity in file order.
+    batch_sizes is {supplier: orders per batch, or None for one batch}, in the order the
+    suppliers' batches are numbered; lines of other suppliers are left out. A supplier's
+    orders are taken in order of first appearance and cut into batches of that many orders.
+    Within a batch each order's lines are together and in file order.
+
+    Returns the four input columns plus batch (numbered from 0 across all suppliers) and
+    supplier_batch (numbered from 0 per supplier).
+    """
+    names = list(batch_sizes)
+    lines = supplier_orders[supplier_orders['Supplier Name'].isin(names)]
+    supplier_rank = lines['Supplier Name'].map({name: rank for rank, name in enumerate(names)}).to_numpy(dtype=np.int64)
+    order_codes, order_values = pd.factorize(lines['Order number'])
+    stride = max(len(order_values), 1)
+
+    # Each (supplier, order) pair numbered by first appearance, then counted within its supplier.
+    pair_ids, pairs = pd.factorize(supplier_rank * stride + order_codes)
+    pair_supplier = pairs // stride
+    pair_ordinal = pd.Series(pair_supplier).groupby(pair_supplier).cumcount().to_numpy()
+    sizes = np.array([batch_sizes[name] or len(pairs) or 1 for name in names], dtype=np.int64)
+    pair_batch = pair_ordinal // sizes[pair_supplier]
+    _, pair_global = np.unique(pair_supplier * (len(pairs) + 1) + pair_batch, return_inverse=True)
+
+    batch = pair_global[pair_ids]
+    order = np.lexsort((pair_ids, batch))
+    return pd.DataFrame({
+        'Supplier Name': lines['Supplier Name'].to_numpy()[order],
+        'Order number': lines['Order number'].to_numpy()[order],
+        'Offer SKU': lines['Offer SKU'].to_numpy()[order],
+        'Quantity': lines['Quantity'].to_numpy()[order],
+        'batch': batch[order],
+        'supplier_batch': pair_batch[pair_ids][order],
+    })
+
+
+def batch_lines(batches: pd.DataFrame) -> dict:
+    """{batch: (supplier, {order number: [(sku, qty), ...]})} for the frame from assign_batches, in one pass."""
+    out = {}
+    columns = ['batch', 'Supplier Name', 'Order number', 'Offer SKU', 'Quantity']
+    for batch, supplier, order_no, sku, qty in zip(*(batches[column].tolist() for column in columns)):
+        entry = out.get(batch)
+        if entry is None:
+            entry = out[batch] = (supplier, {})
+        entry[1].setdefault(order_no, []).append((sku, qty))
+    return out
+
+
+def po_lines(frame: pd.DataFrame) -> pd.DataFrame:
+    """Batch lines with the PO CSV column names."""
+    return frame[['Order number', 'Offer SKU', 'Quantity']].set_axis(PO_CSV_COLUMNS, axis=1)
+
+
+def _csv_rows(frame: pd.DataFrame) -> list:
+    text = po_lines(frame).to_csv(index=False, header=False)
+    return [row + os.linesep for row in text.split(os.linesep)[:-1]]
+
+
+def render_batch_csvs(batches: pd.DataFrame, pool=None) -> dict:
+    """{batch: CSV bytes} for every batch in a frame sorted as assign_batches returns it.
+
+    All lines are rendered as one CSV and cut at the batch boundaries, so the per-batch cost
+    is a join rather than a DataFrame and a to_csv call; the text is what to_csv writes for
+    each batch on its own. With a pool and at least PARALLEL_RENDER_MIN_ROWS lines, chunks of
+    that many lines are rendered on the pool. Values containing line breaks would break the
+    cut, so those runs render batch by batch.
+    """
+    if batches.empty:
+        return {}
+    text_columns = [batches[column] for column in ('Order number', 'Offer SKU') if not pd.api.types.is_numeric_dtype(batches[column])]
+    if any(column.astype(str).str.contains('[\r\n]').any() for column in text_columns):
+        return {batch: po_lines(frame).to_csv(index=False).encode('utf-8') for batch, frame in batches.groupby('batch', sort=True)}
+
+    header = po_lines(batches.iloc[:0]).to_csv(index=False)
+    if pool is not None and len(batches) >= 2 * PARALLEL_RENDER_MIN_ROWS:
+        chunks = [batches.iloc[start:start + PARALLEL_RENDER_MIN_ROWS] for start in range(0, len(batches), PARALLEL_RENDER_MIN_ROWS)]
+        rows = [row for chunk_rows in pool.map(_csv_rows, chunks) for row in chunk_rows]
+    else:
+        rows = _csv_rows(batches)
+    batch = batches['batch'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, batch[1:] != batch[:-1]])
+    stops = np.r_[starts[1:], len(batch)]
+    return {
+        int(batch[start]): (header + "".join(rows[start:stop])).encode('utf-8')
+        for start, stop in zip(starts.tolist(), stops.tolist())
+    }
+
+
+def zip_files(files: dict) -> bytes:
+    """A deflated zip of {file name: bytes}."""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
@@ -0,0 +1,154 @@
+# po_index.py
+import json
+import os
+import threading
+import time
+
+PO_INDEX_REFRESH_SECONDS = int(os.getenv("PO_INDEX_REFRESH_SECONDS", "300"))
+
+
+def normalise_sku(sku) -> str:
+    return str(sku).strip().upper()
+
+
+class PoIndex:
+    """In-memory hash indexes over the PO map for the admin lookup tools.
+
+    (PO, normalised SKU) -> order numbers, plus reverse indexes SKU -> POs and order -> POs.
+    POs logged by this process are indexed as soon as they are appended; POs written by
+    other workers are picked up by a background refresh once the index is older than
+    PO_INDEX_REFRESH_SECONDS, so lookups themselves never wait on Graph after the first load.
+    """
+
+    def __init__(self, load_po_map, refresh_seconds: int = PO_INDEX_REFRESH_SECONDS):
+        self._load_po_map = load_po_map
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._by_po_sku = {}
+        self._sku_pos = {}
+        self._order_pos = {}
+        self._po_keys = {}
+        self._po_orders = {}
+        self._po_signature = {}
+        self._loaded_at = None
+        self._refreshing = False
+
+    def _remove_po(self, po):
+        for key in self._po_keys.pop(po, ()):
+            self._by_po_sku.pop(key, None)
+            sku_pos = self._sku_pos.get(key[1])
+            if sku_pos is not None:
+                sku_pos.discard(po)
+                if not sku_pos:
+                    del self._sku_pos[key[1]]
+        for order in self._po_orders.pop(po, ()):
+            order_pos = self._order_pos.get(order)
+            if order_pos is not None:
+                order_pos.discard(po)
+                if not order_pos:
+                    del self._order_pos[order]
+
+    def _add_po(self, po, rows):
+        keys = []
+        orders = set()
+        for row in rows:
+            sku = normalise_sku(row.get("Offer SKU", ""))
+            order = row.get("Order Number")
+            key = (po, sku)
+            if key not in self._by_po_sku:
+                self._by_po_sku[key] = []
+                keys.append(key)
+            self._by_po_sku[key].append(order)
+            self._sku_pos.setdefault(sku, set()).add(po)
+            order_key = str(order).strip()
+            orders.add(order_key)
+            self._order_pos.setdefault(order_key, set()).add(po)
+        self._po_keys[po] = keys
+        self._po_orders[po] = orders
+
+    def add_entries(self, po_entries: dict) -> int:
+        """Index {po_number: batch_rows}, skipping POs whose rows are already indexed unchanged."""
+        changed = 0
+        with self._lock:
+            for po, rows in po_entries.items():
+                signature = hash(json.dumps(rows, sort_keys=True, default=str))
+                if self._po_signature.get(po) == signature:
+                    continue
+                if po in self._po_keys:
+                    self._remove_po(po)
+                self._add_po(po, rows)
+                self._po_signature[po] = signature
+                changed += 1
+        return changed
+
+    def refresh(self) -> int:
+        """Reload the PO map and index whatever is new or changed; a failed load leaves the index unloaded or stale."""
+        try:
+            changed = self.add_entries(self._load_po_map())
+            self._loaded_at = time.monotonic()
+            return changed
+        finally:
+            self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            self.refresh()
+            return
+        if time.monotonic() - self._loaded_at > self.refresh_seconds and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, name="po-index-refresh", daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"PO index refresh failed, serving the previous index: {e}")
+
+    # Lookups hold the lock so a refresh thread never changes the dicts and sets mid-read.
+    def orders_for(self, po_number: str, sku) -> list:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._by_po_sku.get((po_number.strip(), normalise_sku(sku)), ()))
+
+    def has_po(self, po_number: str) -> bool:
+        """True when the PO has at least one line; an empty batch counts as not found."""
+        self._ensure_loaded()
+        with self._lock:
+            return bool(self._po_keys.get(po_number.strip()))
+
+    def pos_for_sku(self, sku) -> list:
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(self._sku_pos.get(normalise_sku(sku), ()))
+
+    def pos_for_order(self, order_number) -> list:
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(self._order_pos.get(str(order_number).strip(), ()))
+
+    def bulk_lookup(self, skus, po_number: str = None) -> dict:
+        """{sku: [{"po": ..., "orders": [...]}, ...]} for many SKUs, optionally within one PO."""
+        self._ensure_loaded()
+        result = {}
+        with self._lock:
+            for sku in skus:
+                norm = normalise_sku(sku)
+                pos = [po_number.strip()] if po_number else sorted(self._sku_pos.get(norm, ()))
+                result[sku] = [
+                    {"po": po, "orders": list(self._by_po_sku[(po, norm)])}
+                    for po in pos if (po, norm) in self._by_po_sku
+                ]
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pos": len(self._po_keys),
+                "po_sku_keys": len(self._by_po_sku),
+                "skus": len(self._sku_pos),
+                "orders": len(self._order_pos),
+            }
@@ -0,0 +1,140 @@
+# po_map_store.py
+import json
+import os
+import tempfile
+import time
+import uuid
+from host_lock import HostLock
+
+PO_MAP_LOG_PATH = os.getenv("PO_MAP_LOG_PATH", os.path.join(tempfile.gettempdir(), "caterboss_po_map.jsonl"))
+
+
+class PoMapStore:
+    """Append-only local log of PO batches, compacted into the OneDrive PO map JSON.
+
+    A run appends all of its POs to the log in one write. compact() folds every logged entry
+    into the OneDrive map with one download and one upload, then drops those entries from the
+    log. If OneDrive is unreachable the entries stay in the log and the next compaction
+    retries them, so no PO is lost and the OneDrive copy never has to be rewritten per batch.
+
+    The log is shared by every uvicorn worker on the host, so reads and writes of it hold a
+    host-wide lock on <log_path>.lock. Compactions take a second host-wide lock and do their
+    Graph I/O outside the log lock, so appends and stats never wait on OneDrive.
+    """
+
+    def __init__(self, download, upload, log_path: str = PO_MAP_LOG_PATH):
+        self._download = download
+        self._upload = upload
+        self.log_path = log_path
+        self._log_lock = HostLock(log_path + ".lock")
+        self._compact_lock = HostLock(log_path + ".compact.lock")
+        self.appends = 0
+        self.compactions = 0
+        self.last_compaction_error = None
+        # Called with {po_number: batch_rows} after every append, e.g. to update a lookup index.
+        self.listeners = []
+
+    def _read_log(self) -> list:
+        entries = []
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-append; everything before it is intact.
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def append(self, po_entries: dict) -> None:
+        """Durably record {po_number: batch_rows} for one run in a single append."""
+        if not po_entries:
+            return
+        now = time.time()
+        lines = "".join(
+            json.dumps({"id": uuid.uuid4().hex, "po": po, "rows": rows, "ts": now}) + "\n"
+            for po, rows in po_entries.items()
+        )
+        with self._log_lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.appends += 1
+        for listener in self.listeners:
+            listener(po_entries)
+
+    def pending(self) -> dict:
+        """{po_number: batch_rows} logged locally but not yet compacted into OneDrive."""
+        with self._log_lock:
+            return {entry["po"]: entry["rows"] for entry in self._read_log()}
+
+    def load(self) -> dict:
+        """The full PO map: the OneDrive copy overlaid with entries still waiting in the log.
+
+        Raises when OneDrive cannot be read (other than a missing file), so callers can tell
+        a failed load from an empty map.
+        """
+        po_map = self.download_strict()
+        po_map.update(self.pending())
+        return po_map
+
+    def download_strict(self) -> dict:
+        """The OneDrive PO map; {} only when the file does not exist yet, any other failure raises."""
+        try:
+            return self._download()
+        except Exception as e:
+            if getattr(getattr(e, "response", None), "status_code", None) == 404:
+                return {}
+            raise
+
+    def compact(self) -> int:
+        """Fold the log into the OneDrive PO map with one write; returns how many entries were synced.
+
+        A failed download or upload leaves every entry in the log for the next compaction, so
+        the OneDrive map is never replaced by the log alone.
+        """
+        with self._compact_lock:
+            with self._log_lock:
+                entries = self._read_log()
+            if not entries:
+                return 0
+            try:
+                po_map = self.download_strict()
+                for entry in entries:
+                    po_map[entry["po"]] = entry["rows"]
+                self._upload(po_map)
+            except Exception as e:
+                self.last_compaction_error = str(e)
+                raise
+            synced = {entry["id"] for entry in entries}
+            with self._log_lock:
+                remaining = [entry for entry in self._read_log() if entry["id"] not in synced]
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.log_path)), suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in remaining))
+                os.replace(tmp_path, self.log_path)
+            self.compactions += 1
+            self.last_compaction_error = None
+            return len(synced)
+
+    def commit(self, po_entries: dict) -> None:
+        """Append one run's POs and push them to OneDrive; a failed push is retried by the next compaction."""
+        self.append(po_entries)
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"PO map compaction failed, {len(self.pending())} PO(s) kept in local log: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "appends": self.appends,
+            "compactions": self.compactions,
+            "pending": len(self.pending()),
+            "last_compaction_error": self.last_compaction_error,
+        }
@@ -0,0 +1,119 @@
+# snapshots.py
+import os
+import tempfile
+import threading
+from file_cache import GRAPH_CACHE_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # snapshots are an optimisation; without pyarrow every read parses the file
+    pa = None
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(GRAPH_CACHE_DIR, "snapshots"))
+
+_TAG_KEY = b"caterboss_source_tag"
+
+
+class SnapshotStore:
+    """Arrow IPC snapshots of parsed OneDrive files, one per (item id, parse kind).
+
+    Each snapshot carries the cTag of the file it was parsed from in its schema metadata and
+    is only used while that tag is current, so the xlsx stays the source of truth and a
+    changed file is simply parsed again and re-snapshotted. Snapshots are opened memory-mapped.
+    A frame that Arrow cannot round-trip exactly (e.g. a column mixing text and numbers) is
+    not snapshotted and keeps being parsed from the file.
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.unsupported = 0
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def _path(self, item_id: str, kind: str) -> str:
+        return os.path.join(self.root, f"{item_id}.{kind}.arrow")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def load(self, item_id: str, kind: str, tag: str):
+        """The snapshotted DataFrame for this tag, or None when there is no current snapshot.
+
+        An item without a tag (no cTag/eTag from Graph) cannot be validated, so it never hits.
+        """
+        if not self.enabled:
+            return None
+        if not tag:
+            self._count("misses")
+            return None
+        try:
+            with pa.memory_map(self._path(item_id, kind), "r") as source:
+                reader = ipc.open_file(source)
+                if (reader.schema.metadata or {}).get(_TAG_KEY) != tag.encode("utf-8"):
+                    self._count("misses")
+                    return None
+                df = reader.read_all().to_pandas()
+        except (OSError, pa.ArrowException):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return df
+
+    def save(self, item_id: str, kind: str, tag: str, df) -> bool:
+        if not self.enabled or not tag:
+            return False
+        try:
+            table = pa.Table.from_pandas(df)
+            exact = table.to_pandas().equals(df)
+        except (pa.ArrowException, ValueError, TypeError):
+            exact = False
+        if not exact:
+            self._count("unsupported")
+            return False
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _TAG_KEY: tag.encode("utf-8")})
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, self._path(item_id, kind))
+        except OSError as e:
+            print(f"Could not write snapshot for {item_id}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        self._count("writes")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "unsupported": self.unsupported,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Return the process-wide snapshot store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
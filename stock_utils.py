@@ -1,22 +1,29 @@
 import httpx
 import pandas as pd
 from io import BytesIO
+from workers import run_blocking
+from excel_reader import read_xlsx
+from snapshots import get_snapshot_store
 
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
 
 # Util to download an Excel file and read its contents
 async def download_excel_file(token: str, site_id: str, drive_id: str, item_id: str) -> pd.DataFrame:
     headers = {"Authorization": f"Bearer {token}"}
-
-    # Download the Excel file binary
-    url = f"{GRAPH_BASE}/sites/{site_id}/drives/{drive_id}/items/{item_id}/content"
+    url = f"{GRAPH_BASE}/sites/{site_id}/drives/{drive_id}/items/{item_id}"
     async with httpx.AsyncClient() as client:
-        resp = await client.get(url, headers=headers)
-        resp.raise_for_status()
-        file_bytes = BytesIO(resp.content)
-
-    # Load as Excel
-    df = pd.read_excel(file_bytes)
+        # The content tag decides whether the local snapshot is still current
+        meta = await client.get(url, headers=headers, params={"$select": "id,eTag,cTag"})
+        meta.raise_for_status()
+        tag = meta.json().get("cTag") or meta.json().get("eTag")
+        snapshots = get_snapshot_store()
+        df = await run_blocking(snapshots.load, item_id, "xlsx", tag)
+        if df is None:
+            resp = await client.get(f"{url}/content", headers=headers)
+            resp.raise_for_status()
+            # Load as Excel off the event loop
+            df = await run_blocking(read_xlsx, BytesIO(resp.content))
+            await run_blocking(snapshots.save, item_id, "xlsx", tag, df)
     if 'SKU' not in df.columns or 'Quantity' not in df.columns:
         raise ValueError(f"Missing SKU or Quantity column in file {item_id}")
     return df[['SKU', 'Quantity']]
@@ -0,0 +1,167 @@
+# suppliers.py
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+# "text" shows the supplier's orders as a copyable list; "po_csv" also writes one CSV per
+# batch under a new PO number, recorded in the PO map.
+EXPORT_FORMATS = ("text", "po_csv")
+
+
+class Supplier:
+    """A supplier order lines are routed to.
+
+    name            Supplier Name as written in Supplier.csv
+    stock_file_id   OneDrive item id of its stock sheet; None when nothing ships from stock
+    batch_size      orders per batch (and per PO file); None keeps all of a run's orders together
+    export          one of EXPORT_FORMATS
+    """
+
+    def __init__(self, name: str, stock_file_id: str = None, batch_size: int = None, export: str = "text"):
+        if export not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export!r} for supplier {name}")
+        if batch_size is not None and int(batch_size) < 1:
+            raise ValueError(f"batch_size for supplier {name} must be at least 1")
+        self.name = name
+        self.stock_file_id = stock_file_id
+        self.batch_size = None if batch_size is None else int(batch_size)
+        self.export = export
+
+    @property
+    def key(self) -> str:
+        """Lower-case name with only letters and digits, for ids and input names."""
+        return re.sub(r"[^a-z0-9]", "", self.name.lower())
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "stock_file_id": self.stock_file_id,
+            "batch_size": self.batch_size,
+            "export": self.export,
+        }
+
+
+class RoutingTable:
+    """Supplier.csv and the stock sheets compiled into arrays over the SKU catalogue.
+
+    For every SKU in Supplier.csv: the integer code of its supplier (its position in names,
+    -1 when that supplier is not registered) and its opening stock (0 when the SKU is not on
+    the supplier's stock sheet, NaN for a blank stock cell). Routing order lines is then one
+    index lookup and two array takes however many suppliers there are.
+    """
+
+    def __init__(self, names: list, skus: pd.Index, supplier_codes: np.ndarray, opening: np.ndarray):
+        self.names = names
+        self.skus = skus
+        self.supplier_codes = supplier_codes
+        self.opening = opening
+
+    def positions(self, skus: pd.Series) -> np.ndarray:
+        """Catalogue position of each SKU, -1 when it is not in Supplier.csv; categorical SKUs are looked up once per category."""
+        if isinstance(skus.dtype, pd.CategoricalDtype):
+            category_positions = np.append(self.skus.get_indexer(skus.cat.categories), -1)
+            return category_positions[skus.cat.codes.to_numpy()]
+        return self.skus.get_indexer(skus)
+
+    def route(self, skus: pd.Series):
+        """(catalogue position, supplier code, opening stock) per SKU; code is -1 for lines no registered supplier takes."""
+        pos = self.positions(skus)
+        found = pos >= 0
+        codes = np.where(found, self.supplier_codes[pos], -1)
+        opening = np.where(found, self.opening[pos], 0.0)
+        return pos, codes, opening
+
+
+def _new_throughput() -> dict:
+    return {"runs": 0, "from_stock_lines": 0, "ordered_lines": 0, "last_run": None}
+
+
+class SupplierRegistry:
+    """The registered suppliers, in the order their results are shown, and their routing tables.
+
+    compile() keeps the last table and reuses it while it is handed the same (memoised,
+    read-only) supplier map and stock maps, so an unchanged set of files is compiled once.
+    """
+
+    def __init__(self):
+        self._suppliers = {}
+        self._lock = threading.Lock()
+        self._compiled = None
+        self.compiles = 0
+        self.throughput = {}
+
+    def register(self, supplier: Supplier) -> None:
+        with self._lock:
+            self._suppliers[supplier.name] = supplier
+            self._compiled = None
+            self.throughput.setdefault(supplier.name, _new_throughput())
+
+    def suppliers(self) -> list:
+        return list(self._suppliers.values())
+
+    def stocked(self) -> list:
+        """Suppliers with a stock sheet."""
+        return [supplier for supplier in self._suppliers.values() if supplier.stock_file_id]
+
+    def names(self) -> list:
+        return list(self._suppliers)
+
+    def get(self, name: str) -> Supplier:
+        return self._suppliers[name]
+
+    def compile(self, sku_to_supplier: dict, stock_maps: dict) -> RoutingTable:
+        """Routing table for {Offer SKU: Supplier Name} and {supplier: {Offer SKU: Quantity}}."""
+        inputs = (sku_to_supplier, tuple(stock_maps.get(name) for name in self._suppliers))
+        with self._lock:
+            compiled = self._compiled
+            if compiled is not None and compiled[0][0] is inputs[0] and all(
+                a is b for a, b in zip(compiled[0][1], inputs[1])
+            ):
+                return compiled[1]
+            names = list(self._suppliers)
+            codes_by_name = {name: code for code, name in enumerate(names)}
+            skus = [sku for sku in sku_to_supplier if not pd.isna(sku)]
+            supplier_codes = np.full(len(skus), -1, dtype=np.int32)
+            opening = np.zeros(len(skus), dtype=np.float64)
+            for pos, sku in enumerate(skus):
+                code = codes_by_name.get(sku_to_supplier[sku], -1)
+                supplier_codes[pos] = code
+                if code < 0:
+                    continue
+                stock = stock_maps.get(names[code])
+                if stock is not None and sku in stock:
+                    quantity = stock[sku]
+                    opening[pos] = np.nan if quantity is None else quantity
+            table = RoutingTable(names, pd.Index(skus), supplier_codes, opening)
+            self._compiled = (inputs, table)
+            self.compiles += 1
+            return table
+
+    def record_run(self, allocation) -> None:
+        """Add one run's lines shipped from stock and lines ordered, per supplier, to the throughput stats."""
+        shipped = allocation.stock_ship.groupby('Supplier Name', sort=False).size()
+        ordered = allocation.supplier_orders.groupby('Supplier Name', sort=False)
+        ordered_lines = ordered.size()
+        ordered_orders = ordered['Order number'].nunique()
+        with self._lock:
+            for name in self._suppliers:
+                run = {
+                    "from_stock_lines": int(shipped.get(name, 0)),
+                    "ordered_lines": int(ordered_lines.get(name, 0)),
+                    "ordered_orders": int(ordered_orders.get(name, 0)),
+                }
+                stats = self.throughput.setdefault(name, _new_throughput())
+                stats["runs"] += 1
+                stats["from_stock_lines"] += run["from_stock_lines"]
+                stats["ordered_lines"] += run["ordered_lines"]
+                stats["last_run"] = run
+
+    def stats(self) -> dict:
+        return {
+            "compiles": self.compiles,
+            "suppliers": [
+                {**supplier.to_dict(), **self.throughput.get(supplier.name, {})}
+                for supplier in self._suppliers.values()
+            ],
+        }
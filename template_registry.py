@@ -0,0 +1,77 @@
+# template_registry.py
+import csv
+import os
+import threading
+from excel_reader import read_xlsx
+
+
+def zoho_layout(path: str) -> dict:
+    """Column order of the Zoho import template (its header row)."""
+    columns = list(read_xlsx(path, nrows=0).columns)
+    if "Order number" not in columns:
+        raise ValueError(f"{path} has no 'Order number' column")
+    return {"columns": columns}
+
+
+def dpd_layout(path: str, min_columns: int = 32) -> dict:
+    """Delimiter, header row and width of the DPD import template.
+
+    The file's first row numbers the columns and the second row names them; only those
+    matter, so the rest of the (very wide, mostly empty) file is never parsed into a frame.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        sample = f.read(2048)
+        delimiter = "," if sample.count(",") > sample.count(";") else ";"
+        f.seek(0)
+        rows = list(csv.reader(f, delimiter=delimiter))
+    if len(rows) < 2:
+        raise ValueError(f"{path} has no header row")
+    column_count = max(len(row) for row in rows)
+    if column_count < min_columns:
+        raise ValueError(f"{path} has {column_count} columns, expected at least {min_columns}")
+    headers = rows[1] + [""] * (column_count - len(rows[1]))
+    return {"delimiter": delimiter, "headers": headers, "column_count": column_count}
+
+
+class TemplateRegistry:
+    """Template layouts loaded once and reloaded only when the template file's mtime changes.
+
+    get() is a stat plus a dict lookup on the upload path. A template that fails to load
+    raises on every get() until the file is fixed, so callers report it as before.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def register(self, name: str, path: str, loader) -> None:
+        with self._lock:
+            self._templates[name] = {"path": path, "loader": loader, "mtime": None, "layout": None}
+
+    def get(self, name: str) -> dict:
+        entry = self._templates[name]
+        mtime = os.stat(entry["path"]).st_mtime_ns
+        if entry["mtime"] == mtime:
+            return entry["layout"]
+        with self._lock:
+            if entry["mtime"] != mtime:
+                entry["layout"] = entry["loader"](entry["path"])
+                entry["mtime"] = mtime
+                self.loads += 1
+                print(f"Loaded {name} template from {entry['path']}")
+            return entry["layout"]
+
+    def preload(self) -> None:
+        """Load every template now, so the first upload does not pay for it; failures are only logged."""
+        for name in list(self._templates):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Could not load {name} template: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "loaded": sorted(name for name, entry in self._templates.items() if entry["layout"] is not None),
+        }
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+# Point every on-disk store at a scratch directory before main is imported.
+_scratch = tempfile.mkdtemp(prefix="caterboss_tests_")
+for name in ("ARTIFACT_DIR", "GRAPH_CACHE_DIR", "UPLOAD_LEDGER_DIR"):
+    os.environ.setdefault(name, os.path.join(_scratch, name.lower()))
+os.environ.setdefault("PO_MAP_LOG_PATH", os.path.join(_scratch, "po_map.jsonl"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_drive(monkeypatch):
+    """Supplier map, stock sheets and PO map kept in memory; stock reads are slow enough for runs to overlap."""
+    import main
+
+    stock = {
+        main.NISBETS_STOCK_FILE_ID: pd.DataFrame({"Offer SKU": ["SKU1", "SKU2"], "Quantity": [10, 0]}),
+        main.NORTONS_STOCK_FILE_ID: pd.DataFrame({"Offer SKU": ["SKU3"], "Quantity": [5]}),
+    }
+    committed = []
+    lock = threading.Lock()
+
+    def load_stock_sheet(file_id):
+        with lock:
+            sheet = stock[file_id].copy()
+        time.sleep(0.3)
+        return sheet, sheet.set_index("Offer SKU")["Quantity"].to_dict()
+
+    def update_stock_file(file_id, stock_df, previous_quantities):
+        with lock:
+            stock[file_id] = stock_df.copy()
+        return "full"
+
+    monkeypatch.setattr(main, "load_supplier_map", lambda: {"SKU1": "Nisbets", "SKU2": "Nisbets", "SKU3": "Nortons"})
+    monkeypatch.setattr(main, "load_stock_sheet", load_stock_sheet)
+    monkeypatch.setattr(main, "load_sku_limits", lambda: {})
+    monkeypatch.setattr(main, "update_stock_file", update_stock_file)
+    monkeypatch.setattr(main.po_store, "commit", committed.append)
+    return stock, committed
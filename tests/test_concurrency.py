@@ -0,0 +1,91 @@
+import threading
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from graph_client import GraphClient
+
+BLOCK_TIMEOUT = 10
+
+
+@pytest.fixture
+def blocked_graph(monkeypatch):
+    """Every Graph call waits until the test releases it, then fails like an unreachable Graph."""
+    entered = threading.Event()
+    release = threading.Event()
+
+    def request(self, method, path, headers=None, **kwargs):
+        entered.set()
+        release.wait(BLOCK_TIMEOUT)
+        raise ConnectionError("Graph is stubbed out in tests")
+
+    monkeypatch.setattr(GraphClient, "request", request)
+    yield entered, release
+    release.set()
+
+
+def order_file_bytes(lines=None):
+    lines = lines or {"Order number": ["1001-A"], "Offer SKU": ["SKU1"], "Quantity": [2]}
+    buf = BytesIO()
+    pd.DataFrame(lines).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def test_downloads_answer_while_upload_is_blocked(blocked_graph):
+    entered, release = blocked_graph
+    run_id = main.new_run_id()
+    main.artifact_store.start_run(run_id)
+    main.artifact_store.put(run_id, "DPD_Export.csv", b"dpd")
+    main.artifact_store.put(run_id, "PO123.csv", b"po")
+
+    with TestClient(main.app) as client:
+        client.post("/admin-login", data={"password": "caterboss2025"}, follow_redirects=False)
+        upload = {}
+
+        def post_upload():
+            upload["response"] = client.post(
+                "/upload_orders/display",
+                files={"file": ("orders.xlsx", order_file_bytes())},
+                data={"force": "true"},
+            )
+
+        uploader = threading.Thread(target=post_upload)
+        uploader.start()
+        try:
+            assert entered.wait(BLOCK_TIMEOUT), "upload never reached Graph"
+
+            dpd = client.get(f"/download_dpd_csv?run={run_id}")
+            po = client.get(f"/download_po_csv/PO123?run={run_id}")
+
+            assert uploader.is_alive() and not release.is_set()
+            assert (dpd.status_code, dpd.content) == (200, b"dpd")
+            assert (po.status_code, po.content) == (200, b"po")
+        finally:
+            release.set()
+            uploader.join(BLOCK_TIMEOUT)
+    assert not uploader.is_alive()
+    assert upload["response"].status_code == 500
+
+
+def test_overlapping_uploads_keep_every_stock_decrement(fake_drive):
+    stock, committed = fake_drive
+    order = order_file_bytes({"Order number": ["1001-A", "1001-A"], "Offer SKU": ["SKU1", "SKU2"], "Quantity": [2, 1]})
+    responses = []
+
+    def upload():
+        responses.append(main.process_order_upload(BytesIO(order)))
+
+    runs = [threading.Thread(target=upload) for _ in range(2)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join(30)
+
+    assert [response.status_code for response in responses] == [200, 200]
+    nisbets = stock[main.NISBETS_STOCK_FILE_ID].set_index("Offer SKU")["Quantity"]
+    assert nisbets["SKU1"] == 6
+    po_numbers = [po for entries in committed for po in entries]
+    assert len(po_numbers) == 2 and len(set(po_numbers)) == 2
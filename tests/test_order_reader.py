@@ -0,0 +1,26 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import excel_reader
+from order_reader import read_orders
+
+COLUMNS = ['Order number', 'Offer SKU']
+
+
+@pytest.mark.parametrize("engine", excel_reader.available_engines())
+def test_rows_blank_in_wanted_columns_are_kept(monkeypatch, engine):
+    monkeypatch.setattr(excel_reader, "EXCEL_ENGINE", engine)
+    buf = BytesIO()
+    pd.DataFrame({
+        'Order number': ['1-A', None, '3-A', None],
+        'Offer SKU': ['SKU1', None, 'SKU3', None],
+        'Other': ['x', 'y', None, 'z'],
+    }).to_excel(buf, index=False)
+    expected = pd.read_excel(BytesIO(buf.getvalue()), engine="openpyxl")[COLUMNS]
+
+    got = read_orders(BytesIO(buf.getvalue()), COLUMNS)
+
+    assert len(got) == 4
+    assert got.equals(expected)
@@ -0,0 +1,46 @@
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import main
+from po_index import PoIndex
+
+
+def failing_download():
+    response = requests.Response()
+    response.status_code = 503
+    raise requests.HTTPError("503 Service Unavailable", response=response)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.po_store, "_download", failing_download)
+    monkeypatch.setattr(main.po_index, "_loaded_at", None)
+    with TestClient(main.app) as client:
+        client.post("/admin-login", data={"password": "caterboss2025"}, follow_redirects=False)
+        yield client
+
+
+def test_lookup_json_reports_po_map_failure(client):
+    resp = client.get("/admin/lookup.json", params={"sku": "SKU1"})
+    assert resp.status_code == 502
+    assert "503" in resp.json()["error"]
+    assert not main.po_index.loaded
+
+
+def test_bulk_lookup_reports_po_map_failure(client):
+    resp = client.post("/admin/lookup/bulk", json={"skus": ["SKU1"]})
+    assert resp.status_code == 502
+    assert "503" in resp.json()["error"]
+
+
+def test_lookup_page_reports_po_map_failure(client):
+    resp = client.post("/admin/lookup", data={"po_number": "PO1", "sku": "SKU1"})
+    assert "failed to load" in resp.text
+
+
+def test_empty_batch_is_not_found():
+    index = PoIndex(lambda: {"PO1": [], "PO2": [{"Order Number": "1001-A", "Offer SKU": "sku1"}]})
+    assert not index.has_po("PO1")
+    assert index.has_po("PO2")
+    assert index.orders_for("PO2", " SKU1 ") == ["1001-A"]
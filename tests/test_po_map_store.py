@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import threading
+
+import pytest
+import requests
+
+import host_lock
+from po_map_store import PoMapStore
+
+WORKERS = 4
+RUNS_PER_WORKER = 25
+
+
+def file_backed_store(tmp_path):
+    """A store whose "OneDrive" copy is a JSON file every process shares."""
+    remote = tmp_path / "po_map.json"
+
+    def download():
+        return json.loads(remote.read_text()) if remote.exists() else {}
+
+    def upload(po_map):
+        remote.write_text(json.dumps(po_map))
+
+    return PoMapStore(download, upload, log_path=str(tmp_path / "po_map.jsonl"))
+
+
+def commit_runs(tmp_path, worker):
+    store = file_backed_store(tmp_path)
+    for run in range(RUNS_PER_WORKER):
+        store.commit({f"PO-{worker}-{run}": [{"Offer SKU": "SKU1", "Quantity": 1}]})
+
+
+@pytest.mark.skipif(host_lock.fcntl is None, reason="cross-process locking needs fcntl")
+def test_concurrent_workers_keep_every_po(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=commit_runs, args=(tmp_path, worker)) for worker in range(WORKERS)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    po_map = file_backed_store(tmp_path).load()
+    expected = {f"PO-{worker}-{run}" for worker in range(WORKERS) for run in range(RUNS_PER_WORKER)}
+    assert set(po_map) == expected
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+def failing_store(tmp_path, error, uploads):
+    def download():
+        raise error
+
+    return PoMapStore(download, uploads.append, log_path=str(tmp_path / "po_map.jsonl"))
+
+
+def test_failed_download_keeps_log_and_onedrive_map(tmp_path):
+    uploads = []
+    store = failing_store(tmp_path, http_error(503), uploads)
+    store.append({"PO1": [{"Offer SKU": "SKU1"}]})
+    with pytest.raises(requests.HTTPError):
+        store.compact()
+    assert uploads == []
+    assert store.pending() == {"PO1": [{"Offer SKU": "SKU1"}]}
+
+
+def test_missing_po_map_starts_empty(tmp_path):
+    uploads = []
+    store = failing_store(tmp_path, http_error(404), uploads)
+    store.append({"PO1": [{"Offer SKU": "SKU1"}]})
+    assert store.compact() == 1
+    assert uploads == [{"PO1": [{"Offer SKU": "SKU1"}]}]
+    assert store.pending() == {}
+
+
+def test_stats_do_not_wait_for_a_compaction(tmp_path):
+    uploading = threading.Event()
+    release = threading.Event()
+
+    def upload(po_map):
+        uploading.set()
+        release.wait(10)
+
+    store = PoMapStore(lambda: {}, upload, log_path=str(tmp_path / "po_map.jsonl"))
+    store.append({"PO1": []})
+    compaction = threading.Thread(target=store.compact)
+    compaction.start()
+    try:
+        assert uploading.wait(10)
+        stats = {}
+        reader = threading.Thread(target=lambda: stats.update(store.stats()))
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive()
+        assert stats["pending"] == 1
+    finally:
+        release.set()
+        compaction.join(10)
+    assert store.pending() == {}
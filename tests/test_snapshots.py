@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from snapshots import SnapshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    if not store.enabled:
+        pytest.skip("snapshots need pyarrow")
+    return store
+
+
+def test_untagged_item_is_never_snapshotted(store):
+    df = pd.DataFrame({"Offer SKU": ["SKU1"], "Quantity": [3]})
+    assert not store.save("item", "xlsx", None, df)
+    assert store.load("item", "xlsx", None) is None
+    assert store.misses == 1
+
+
+def test_tagged_item_round_trips(store):
+    df = pd.DataFrame({"Offer SKU": ["SKU1"], "Quantity": [3]})
+    assert store.save("item", "xlsx", '"{ctag},1"', df)
+    assert store.load("item", "xlsx", '"{ctag},1"').equals(df)
+    assert store.load("item", "xlsx", '"{ctag},2"') is None
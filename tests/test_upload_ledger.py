@@ -0,0 +1,42 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import main
+from upload_ledger import upload_digest
+
+
+def order_file_bytes():
+    buf = BytesIO()
+    pd.DataFrame({"Order number": ["2001-A"], "Offer SKU": ["SKU1"], "Quantity": [2]}).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def nisbets_sku1(stock):
+    return stock[main.NISBETS_STOCK_FILE_ID].set_index("Offer SKU")["Quantity"]["SKU1"]
+
+
+def test_retry_after_failure_does_not_reapply_stock(fake_drive, monkeypatch):
+    stock, _ = fake_drive
+    content = order_file_bytes()
+    digest = upload_digest(content)
+
+    def fail_dpd(*args, **kwargs):
+        raise RuntimeError("DPD export failed")
+
+    with monkeypatch.context() as failing:
+        failing.setattr(main, "build_dpd_export", fail_dpd)
+        with pytest.raises(RuntimeError):
+            main.process_order_upload(BytesIO(content), digest=digest)
+    assert nisbets_sku1(stock) == 8
+    assert main.upload_ledger.lookup(digest) is None
+
+    retry = main.process_order_upload(BytesIO(content), digest=digest)
+    assert retry.status_code == 200
+    assert b"Stock already updated" in retry.body
+    assert nisbets_sku1(stock) == 8
+
+    forced = main.process_order_upload(BytesIO(content), digest=digest, reapply_stock=True)
+    assert forced.status_code == 200
+    assert nisbets_sku1(stock) == 6
@@ -0,0 +1,141 @@
+# upload_ledger.py
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+UPLOAD_LEDGER_DIR = os.getenv("UPLOAD_LEDGER_DIR", os.path.join(tempfile.gettempdir(), "caterboss_uploads"))
+UPLOAD_LEDGER_DAYS = float(os.getenv("UPLOAD_LEDGER_DAYS", "30"))
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def upload_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class UploadLedger:
+    """Order files that have already been processed, keyed by the SHA-256 of their bytes.
+
+    Each entry records the run that produced the result and the OneDrive tags of the inputs
+    as that run left them, so a re-upload can be answered from the earlier run instead of
+    allocating (and decrementing stock) a second time. Entries live on disk, one JSON file per
+    digest, for UPLOAD_LEDGER_DAYS - longer than run artifacts, so a duplicate is still
+    recognised after its result page has expired. Uploads still being processed are tracked
+    in memory so an identical upload arriving meanwhile joins the running job.
+
+    A run that gets as far as writing stock back marks its digest "stock_applied" straight
+    away, so a retry after a later failure does not decrement the same stock again; the
+    entry becomes "done" when the run succeeds.
+    """
+
+    def __init__(self, root: str = UPLOAD_LEDGER_DIR, retention_seconds: float = UPLOAD_LEDGER_DAYS * 86400):
+        self.root = root
+        self.retention_seconds = retention_seconds
+        self._active = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.recorded = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if not _DIGEST.match(digest):
+            raise ValueError(f"Invalid upload digest: {digest!r}")
+        return os.path.join(self.root, f"{digest}.json")
+
+    def _read(self, digest: str):
+        try:
+            path = self._path(digest)
+            if time.time() - os.path.getmtime(path) > self.retention_seconds:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, digest: str, entry: dict) -> None:
+        path = self._path(digest)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def lookup(self, digest: str):
+        """The recorded entry for a previously processed upload that finished, or None."""
+        entry = self._read(digest)
+        if entry is None or entry.get("status", "done") != "done":
+            return None
+        with self._lock:
+            self.duplicates += 1
+        return entry
+
+    def stock_applied(self, digest: str):
+        """The entry of an earlier run that wrote this upload's stock back but did not finish, or None."""
+        entry = self._read(digest)
+        if entry is None or entry.get("status") != "stock_applied":
+            return None
+        return entry
+
+    def mark_stock_applied(self, digest: str, run_id: str) -> None:
+        self._write(digest, {"digest": digest, "run_id": run_id, "status": "stock_applied", "stock_applied_at": time.time()})
+
+    def begin(self, digest: str, run_id: str):
+        """Mark an upload as in progress; returns the run id already processing it, if any."""
+        with self._lock:
+            active = self._active.get(digest)
+            if active is not None:
+                self.duplicates += 1
+                return active
+            self._active[digest] = run_id
+            return None
+
+    def finish(self, digest: str, run_id: str, input_tags: dict = None) -> None:
+        """Release an in-progress upload, recording it when input_tags are given (i.e. it succeeded)."""
+        try:
+            if input_tags is not None:
+                self.record(digest, run_id, input_tags)
+        finally:
+            with self._lock:
+                if self._active.get(digest) == run_id:
+                    del self._active[digest]
+
+    def record(self, digest: str, run_id: str, input_tags: dict) -> None:
+        self._write(digest, {
+            "digest": digest, "run_id": run_id, "status": "done", "processed_at": time.time(), "input_tags": input_tags,
+        })
+        with self._lock:
+            self.recorded += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "duplicates": self.duplicates,
+            "recorded": self.recorded,
+            "in_progress": len(self._active),
+        }
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_upload_ledger() -> UploadLedger:
+    """Return the process-wide upload ledger."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UploadLedger()
+        return _ledger
@@ -0,0 +1,34 @@
+# workers.py
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Heavy pandas stages and blocking Graph calls run here so the event loop keeps
+# serving downloads and admin pages while an upload is being processed.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "4"))
+blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+# Separate pool for the concurrent OneDrive reads started by a blocking stage,
+# so a busy blocking pool can never starve the fetches it is waiting on.
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "8"))
+prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the bounded worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_pool, functools.partial(fn, *args, **kwargs))
+
+# Queued order uploads. Kept apart from the blocking pool so a few long uploads
+# cannot hold up the short admin calls that share it. One at a time by default: runs
+# read and write back the shared stock sheets, so more workers are only safe while
+# main.process_order_upload holds order_run_lock around that section, and even then
+# extra workers just wait on the lock.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+job_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+# Optional pool for rendering the PO CSVs of large runs in chunks. Off by default: rendering
+# holds the GIL, so threads have not beaten the job thread on its own.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render") if RENDER_WORKERS else None
@@ -0,0 +1,64 @@
+# zoho_export.py
+import numpy as np
+import pandas as pd
+
+# Template columns that always get the same value on every line.
+ZOHO_CONSTANTS = {
+    'Shipping total amount': 4.95,
+    'Currency Code': 'EUR',
+    'Account': 'Caterboss Sales',
+    'item Tax': 'VAT',
+    'IteM Tax %': 23,
+    'Trade': 'No',
+    'Channel': 'Caterboss',
+    'Branch': 'Head Office',
+    'Shipping Tax Name': 'VAT',
+    'Shipping Tax percentage': 23,
+    'LCS': 'false',
+    'Sales Person': 'Musgraves Tonka',
+    'Terms': '60',
+    'Sales Order Number': 'MUSGRAVE',
+    'Payment Terms': 'Musgrave',
+}
+
+# Template columns filled from another column of the order sheet.
+ZOHO_COPIED = {
+    'Invoice Number': 'Order number',
+    'Subject': 'Order number',
+}
+
+
+def _date_only(values: pd.Series) -> pd.Series:
+    """The text before the first space of each value, worked out once per distinct value."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    dates = pd.Series(uniques).astype(str).str.split().str[0]
+    return pd.Series(dates.array.take(codes), dtype=dates.dtype)
+
+
+def build_zoho_export(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """The Zoho import sheet for the order lines: the template's columns in its order, lines sorted by order number.
+
+    Each output column is built once and the frame is constructed in one go: order sheet
+    columns (and ZOHO_COPIED ones) are gathered straight into sorted order, ZOHO_CONSTANTS
+    are broadcast, 'Date created' keeps only its date part, and any other template column is
+    left empty.
+    """
+    n = len(df)
+    if 'Order number' in df.columns:
+        order = df['Order number'].reset_index(drop=True).sort_values().index.to_numpy()
+    else:
+        order = np.arange(n)
+    data = {}
+    for name in columns:
+        source = ZOHO_COPIED.get(name, name)
+        if source not in df.columns:
+            source = name
+        if name in ZOHO_CONSTANTS:
+            data[name] = ZOHO_CONSTANTS[name]
+        elif source in df.columns:
+            column = df[source]
+            values = pd.Series(column.array.take(order), dtype=column.dtype)
+            data[name] = _date_only(values) if name == 'Date created' else values
+        else:
+            data[name] = ""
+    return pd.DataFrame(data, index=pd.RangeIndex(n), columns=columns, copy=False)